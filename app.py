@@ -1,21 +1,33 @@
 import gradio as gr
+import uvicorn
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
 from chatbot import FoodOrderChatbot
 import uuid
 
-# Initialize chatbot
+# Initialize chatbot; models load in the background so the UI binds right away
 print("Initializing chatbot...")
-bot = FoodOrderChatbot()
-print("Chatbot ready!")
+bot = FoodOrderChatbot(lazy=True)
+bot.warm_up()
+print("Chatbot started, models warming up...")
 
 # Get default welcome message (no LLM generation on startup)
-welcome_msg = bot.llm._default_welcome()
+welcome_msg = bot.welcome_message()
 
-def chat_interface(message, history, session_state):
+def status_text():
+    """One-line readiness banner for the UI"""
+    health = bot.readiness()
+    if health['ready']:
+        return "🟢 Sẵn sàng"
+    parts = [f"{name.upper()}: {health[name]}" for name in ('rag', 'llm')]
+    return "⏳ Đang khởi động mô hình — menu, giỏ hàng và xác nhận đơn đã sẵn sàng (" + ", ".join(parts) + ")"
+
+async def chat_interface(message, history, session_state):
     """Gradio chat interface"""
     if session_state is None:
         session_state = str(uuid.uuid4())
     
-    response, session_id = bot.chat(message, session_state)
+    response, session_id = await bot.achat(message, session_state)
     
     return response, session_state
 
@@ -27,6 +39,8 @@ with gr.Blocks(title="Food Order Chatbot", theme=gr.themes.Soft()) as demo:
     Sử dụng LLM: **VinaLlama-2.7B-Chat** với RAG
     """)
     
+    status = gr.Markdown(status_text())
+    
     session_state = gr.State(None)
     
     chatbot = gr.Chatbot(
@@ -45,22 +59,29 @@ with gr.Blocks(title="Food Order Chatbot", theme=gr.themes.Soft()) as demo:
         clear = gr.Button("🗑️ Xóa lịch sử chat")
         submit = gr.Button("📤 Gửi", variant="primary")
     
-    def respond(message, chat_history, session):
+    async def respond(message, chat_history, session):
+        # Streams the reply into the bubble as it is generated; awaiting keeps the event loop free
         if session is None:
             session = str(uuid.uuid4())
         
-        response, session = bot.chat(message, session)
-        chat_history.append((message, response))
-        return "", chat_history, session
+        chat_history.append((message, ""))
+        async for partial in bot.achat_stream(message, session):
+            chat_history[-1] = (message, partial)
+            yield "", chat_history, session
     
     def clear_chat():
         """Clear chat and show welcome message again"""
         return [[None, welcome_msg]], str(uuid.uuid4())
     
-    msg.submit(respond, [msg, chatbot, session_state], [msg, chatbot, session_state])
-    submit.click(respond, [msg, chatbot, session_state], [msg, chatbot, session_state])
+    # Gradio runs one event per listener at a time by default; the bot's scheduler already
+    # bounds LLM work and serializes each session, so let every chat event through
+    msg.submit(respond, [msg, chatbot, session_state], [msg, chatbot, session_state], concurrency_limit=None)
+    submit.click(respond, [msg, chatbot, session_state], [msg, chatbot, session_state], concurrency_limit=None)
     clear.click(clear_chat, None, [chatbot, session_state])
     
+    # Refresh the readiness banner; probes use GET /healthz instead
+    demo.load(status_text, None, status, every=5)
+    
     gr.Examples(
         examples=[
             "Cho tôi xem menu",
@@ -75,5 +96,17 @@ with gr.Blocks(title="Food Order Chatbot", theme=gr.themes.Soft()) as demo:
         label="💡 Câu hỏi gợi ý"
     )
 
+# Plain HTTP routes next to the UI: 200 once both models are ready, 503 while warming up
+app = FastAPI()
+
+
+@app.get("/healthz")
+def healthz():
+    health = bot.health()
+    return JSONResponse(health, status_code=200 if health['ready'] else 503)
+
+
+app = gr.mount_gradio_app(app, demo, path="/")
+
 if __name__ == "__main__":
-    demo.launch(server_name="0.0.0.0", server_port=7860, share=False)
+    uvicorn.run(app, host="0.0.0.0", port=7860)
@@ -0,0 +1,50 @@
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from llm_handler import LLMHandler
+
+# Small chat model so the comparison runs on a laptop CPU
+DEFAULT_MODEL = "Qwen/Qwen2.5-0.5B-Instruct"
+
+QUESTIONS = [
+    "Món nào ngon nhất?", "Có món chay không?", "Món nào hợp cho trẻ em?", "Gợi ý món cho bữa trưa",
+    "Món nào cay?", "Nhà hàng có đồ uống gì?", "Có món tráng miệng nào nhẹ không?", "Phở bò có gì đặc biệt?"
+]
+
+
+def run(llm: LLMHandler, n_requests: int, concurrency: int, max_new_tokens: int) -> float:
+    """Send n_requests prompts from `concurrency` threads; returns requests/sec"""
+    prompts = [llm.create_prompt("", QUESTIONS[i % len(QUESTIONS)], []) for i in range(n_requests)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(lambda prompt: llm.generate_response(prompt, max_new_tokens), prompts))
+    return n_requests / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Requests/sec of batched vs one-at-a-time generation")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--requests", type=int, default=16)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--max-new-tokens", type=int, default=32)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--window-ms", type=float, default=10.0)
+    args = parser.parse_args()
+
+    results = []
+    for batch_size in args.batch_sizes:
+        # No prefix reuse: it only applies to unbatched prompts and would favour batch size 1
+        llm = LLMHandler(args.model, max_batch_size=batch_size, batch_window_ms=args.window_ms, max_prefixes=0)
+        run(llm, min(args.concurrency, batch_size), args.concurrency, 4)    # warm-up
+        rps = run(llm, args.requests, args.concurrency, args.max_new_tokens)
+        results.append((batch_size, rps, llm.batch_stats()))
+        llm.close()     # the batching thread holds the model until closed
+        del llm
+
+    print("\n" + "="*60)
+    print(f"{'batch size':>10} {'req/s':>8} {'avg batch':>10} {'avg wait ms':>12}")
+    for batch_size, rps, stats in results:
+        print(f"{batch_size:>10} {rps:>8.2f} {stats.get('avg_batch_size', 1.0):>10.2f} "
+              f"{stats.get('avg_wait_ms', 0.0):>12.1f}")
+    print("="*60)
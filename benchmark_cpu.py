@@ -0,0 +1,25 @@
+import argparse
+import json
+
+from llm_handler import CPU_MODES, LLMHandler
+
+PROMPT_QUESTION = "Gợi ý cho tôi một món ăn trưa nhẹ nhàng"
+
+
+if __name__ == "__main__":
+    # Peak RSS is per process, so measure one weight format per run
+    parser = argparse.ArgumentParser(description="Load time, peak RSS and tokens/sec of the chat model on CPU")
+    parser.add_argument("--model", default="vilm/vinallama-7b-chat")
+    parser.add_argument("--cpu-mode", choices=CPU_MODES, default="bf16")
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--max-new-tokens", type=int, default=64)
+    args = parser.parse_args()
+
+    llm = LLMHandler(args.model, max_batch_size=1, max_prefixes=0, cpu_mode=args.cpu_mode, num_threads=args.threads)
+    prompt = llm.create_prompt("", PROMPT_QUESTION, [])
+    llm.measure_throughput(prompt, 4)   # warm-up
+    report = llm.measure_throughput(prompt, args.max_new_tokens)
+
+    print("\n" + "="*60)
+    print(json.dumps(report, indent=2))
+    print("="*60)
@@ -0,0 +1,85 @@
+from typing import Dict, Iterator, List, Optional, Tuple
+
+
+class Cart:
+    """Item id -> quantity, with the total kept up to date on every change
+
+    Items are held by reference (the catalog's MenuItem objects), so a line
+    costs one dict entry regardless of quantity. Unit prices are taken when an
+    item is first added.
+    """
+
+    __slots__ = ('_quantities', '_items', 'total', 'count')
+
+    def __init__(self):
+        self._quantities = {}   # item id -> quantity, in the order items were added
+        self._items = {}        # item id -> menu item
+        self.total = 0
+        self.count = 0
+
+    def add(self, item, quantity: int = 1):
+        """Add `quantity` units of a menu item"""
+        if quantity <= 0:
+            return
+        item_id = item['id']
+        self._items.setdefault(item_id, item)
+        self._quantities[item_id] = self._quantities.get(item_id, 0) + quantity
+        self.total += self._items[item_id]['price'] * quantity
+        self.count += quantity
+
+    def remove(self, item_id: str, quantity: Optional[int] = None) -> int:
+        """Take `quantity` units (default: the whole line) out; returns how many were removed"""
+        current = self._quantities.get(item_id, 0)
+        removed = current if quantity is None else min(quantity, current)
+        if removed <= 0:
+            return 0
+        self.total -= self._items[item_id]['price'] * removed
+        self.count -= removed
+        if removed == current:
+            del self._quantities[item_id]
+            del self._items[item_id]
+        else:
+            self._quantities[item_id] = current - removed
+        return removed
+
+    def clear(self):
+        self._quantities.clear()
+        self._items.clear()
+        self.total = 0
+        self.count = 0
+
+    def quantity(self, item_id: str) -> int:
+        return self._quantities.get(item_id, 0)
+
+    def lines(self) -> Iterator[Tuple[object, int, int]]:
+        """(item, quantity, subtotal) per line"""
+        for item_id, quantity in self._quantities.items():
+            item = self._items[item_id]
+            yield item, quantity, item['price'] * quantity
+
+    def order_items(self) -> List[list]:
+        """Compact order rows: [item id, quantity, unit price]"""
+        return [[item_id, quantity, self._items[item_id]['price']] for item_id, quantity in self._quantities.items()]
+
+    def to_dict(self) -> Dict:
+        """Session form; items are looked up again in the catalog by from_dict()"""
+        return {'items': [[item_id, quantity] for item_id, quantity in self._quantities.items()]}
+
+    @classmethod
+    def from_dict(cls, data: Dict, catalog) -> 'Cart':
+        """Rebuild from to_dict(); items no longer on the menu are dropped"""
+        cart = cls()
+        for item_id, quantity in data.get('items', ()):
+            item = catalog.get(item_id)
+            if item is not None:
+                cart.add(item, quantity)
+        return cart
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __bool__(self) -> bool:
+        return self.count > 0
+
+    def __contains__(self, item_id: str) -> bool:
+        return item_id in self._quantities
@@ -1,29 +1,200 @@
+import asyncio
+import queue
 import re
+import threading
 import uuid
-from typing import List, Dict, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
 from rag_system import RAGSystem
-from llm_handler import LLMHandler
+from rag_registry import RAGRegistry, DEFAULT_RESTAURANT
+from llm_handler import LLMHandler, FALLBACK_RESPONSE
 from database import Database
+from dish_extractor import DishMention
+from intent_classifier import IntentClassifier
+from menu_responses import MenuResponseCache
+from cart import Cart
+from response_cache import SemanticResponseCache
+from request_scheduler import RequestScheduler
+from session_store import SessionStore, InMemorySessionStore
+
+# Phrases that map to a menu category filter
+CATEGORY_HINTS = {
+    'đồ uống': 'Đồ uống', 'thức uống': 'Đồ uống', 'nước uống': 'Đồ uống',
+    'tráng miệng': 'Tráng miệng', 'khai vị': 'Khai vị', 'món chính': 'Món chính'
+}
+
+# "dưới 30k", "trên 50.000đ", "dưới 1,5 triệu", "từ 30k đến 50k"; a bare "dưới 30" means 30k
+_PRICE_AMOUNT = r"(\d+(?:[.,]\d+)*)\s*(?:(triệu|tr|nghìn|ngàn|k|đồng|đ|vnd)(?!\w))?"
+PRICE_BOUND = re.compile(
+    r"(?<!\w)(dưới|trên|không quá|tối đa|từ)\s*{amount}(?:\s*(?:đến|tới|-)\s*{amount})?".format(amount=_PRICE_AMOUNT)
+)
+# Words that may follow a bare number that is still a price ("dưới 30 nhé"); any other word
+# makes it a count ("trên 2 người", "từ 3 món")
+PRICE_TRAILERS = ('nhé', 'nha', 'ạ', 'thôi', 'đi', 'và', 'không', 'thì', 'mà')
+_NEXT_WORD = re.compile(r"\s*([^\W\d_]+)")
+
+# Intents answered without the LLM; everything else goes through the LLM queue
+RULE_INTENTS = ('order', 'confirm_order', 'cancel', 'view_cart', 'menu_info', 'soup_dishes')
+
+# Reply length budget (new tokens) for intents answered by the LLM
+LLM_TOKEN_BUDGETS = {'price_info': 60, 'general': 150}
+DEFAULT_TOKEN_BUDGET = 150
+
+BUSY_MESSAGE = "Hệ thống đang bận, bạn vui lòng thử lại sau giây lát nhé!"
+
+# "đồ uống trang 2"
+PAGE_NUMBER = re.compile(r"(?:trang|page)\s*(\d+)")
 
 class FoodOrderChatbot:
-    def __init__(self):
-        self.rag = RAGSystem()
-        self.llm = LLMHandler()
+    def __init__(self, registry: RAGRegistry = None, lazy: bool = False, use_intent_classifier: bool = True,
+                 session_store: SessionStore = None, response_cache: SemanticResponseCache = None,
+                 scheduler: RequestScheduler = None, io_workers: int = 8, llm_options: Dict = None):
+        # One shared embedding model; each restaurant's index loads on first use
+        self.registry = registry or RAGRegistry(lazy=lazy)
         self.db = Database()
-        self.sessions = {}
+        # Bounded in-process store by default; SQLiteSessionStore shares sessions across workers
+        self.sessions = session_store or InMemorySessionStore()
+        
+        # LLM answers reused for paraphrases over the same retrieved dishes and menu version
+        self.response_cache = response_cache or SemanticResponseCache()
+        self.registry.add_catalog_listener(lambda catalog: self.response_cache.retire(catalog.source, catalog.version))
+        
+        # Rule-based intents never queue behind LLM generation. Several LLM workers wait on the
+        # handler's batcher at once; it merges their prompts (streamed or not) into one generate
+        # call, and the handler never runs two generate calls on the model concurrently
+        self.scheduler = scheduler or RequestScheduler(llm_workers=4)
+        # achat() runs retrieval, rule-based handlers and SQLite access here, off the event loop
+        self.io_pool = ThreadPoolExecutor(max_workers=io_workers, thread_name_prefix="chat-io")
+        
+        # Menu listings are rendered once per menu version, as soon as a catalog (re)builds
+        self.menu_responses = MenuResponseCache()
+        self.registry.add_catalog_listener(self.menu_responses.warm)
+        
+        # Models load on first use, or in the background after warm_up()
+        self._llm = None
+        self.llm_options = llm_options or {}    # LLMHandler arguments, e.g. cpu_mode='int8', num_threads=8
+        self._llm_lock = threading.Lock()
+        self._warming = set()
+        self._errors = {}
+        
+        # Prototype vectors come straight from the shared embedding model, encoded on first use.
+        # Going through a tenant's RAG would build that tenant's index just to classify
+        self.intent_classifier = None
+        if use_intent_classifier:
+            self.intent_classifier = IntentClassifier(
+                lambda texts: self.registry.embedding_model.encode(texts, convert_to_numpy=True))
+        
+        if not lazy:
+            self.rag.ensure_ready()
+            self.llm
+    
+    @property
+    def llm(self) -> LLMHandler:
+        """The chat model, loaded on first access"""
+        if self._llm is None:
+            with self._llm_lock:
+                if self._llm is None:
+                    self._llm = LLMHandler(**self.llm_options)
+        return self._llm
+    
+    def warm_up(self):
+        """Load the embedding index and the LLM in background threads
+        
+        Rule-based intents (menu, cart, confirm, cancel) are answered meanwhile.
+        """
+        def load(component, loader):
+            try:
+                loader()
+            except Exception as e:
+                self._errors[component] = str(e)
+                print(f"Failed to load {component}: {e}")
+            finally:
+                self._warming.discard(component)
+        
+        for component, loader in (('rag', lambda: self.rag.ensure_ready()), ('llm', lambda: self.llm)):
+            self._warming.add(component)
+            threading.Thread(target=load, args=(component, loader), name=f"warm-up-{component}", daemon=True).start()
+    
+    def _component_status(self, component: str) -> str:
+        ready = self.rag.is_ready if component == 'rag' else self._llm is not None
+        if ready:
+            return 'ready'
+        if component in self._errors:
+            return f"error: {self._errors[component]}"
+        return 'loading' if component in self._warming else 'not loaded'
+    
+    def readiness(self) -> Dict:
+        """Status of each model and overall readiness; cheap enough to poll"""
+        status = {component: self._component_status(component) for component in ('rag', 'llm')}
+        status['ready'] = all(value == 'ready' for value in status.values())
+        return status
+    
+    def health(self) -> Dict:
+        """Readiness plus session, cache and queue statistics; rule-based intents are always available"""
+        status = self.readiness()
+        status['sessions'] = self.sessions.stats()
+        status['response_cache'] = self.response_cache.stats()
+        status['scheduler'] = self.scheduler.stats()
+        if self._llm is not None:
+            status['llm_batching'] = self._llm.batch_stats()
+            status['llm_prefix_cache'] = self._llm.prefix_stats()
+        return status
+    
+    def _can_use(self, component: str, session: Dict = None) -> bool:
+        """False while a component is still loading in the background or failed to load, so callers don't block"""
+        if component == 'rag' and self.get_rag(session or {}).is_ready:
+            return True
+        if component == 'llm' and self._llm is not None:
+            return True
+        return component not in self._warming and component not in self._errors
+    
+    def welcome_message(self) -> str:
+        """Welcome text; available before the LLM has loaded"""
+        return LLMHandler._default_welcome()
     
     def get_session(self, session_id: str) -> Dict:
         """Get or create session"""
-        if session_id not in self.sessions:
-            self.sessions[session_id] = {
-                'cart': [],
+        session = self.sessions.get(session_id)
+        if session is None:
+            session = {
+                'cart': Cart(),
                 'chat_history': [],
-                'current_order_id': None
+                'current_order_id': None,
+                'restaurant_id': DEFAULT_RESTAURANT,
+                'locale': 'vi'
             }
-        return self.sessions[session_id]
+            self.sessions.save(session_id, session)
+        elif not isinstance(session['cart'], Cart):
+            # Stored sessions keep only item ids and quantities
+            session['cart'] = Cart.from_dict(session['cart'], self.get_rag(session).catalog)
+        return session
+    
+    @property
+    def rag(self) -> RAGSystem:
+        """RAG for the default restaurant"""
+        return self.registry.get(DEFAULT_RESTAURANT)
+    
+    def get_rag(self, session: Dict) -> RAGSystem:
+        """RAG for the restaurant this session is ordering from"""
+        return self.registry.get(session.get('restaurant_id'))
     
-    def parse_intent(self, query: str) -> str:
-        """Parse user intent"""
+    def parse_intent(self, query: str, session: Dict = None) -> str:
+        """Parse user intent
+        
+        Uses the embedding classifier when the index is available; the query vector
+        is cached, so retrieval for the same message does not encode again.
+        Falls back to keyword rules when the classifier is unsure.
+        """
+        # Only once the index is loaded: classifying must never trigger (or retry) a model load
+        if self.intent_classifier is not None and self.get_rag(session or {}).is_ready:
+            query_vector = self.get_rag(session or {}).embed_query(query)
+            intent, _ = self.intent_classifier.classify(query_vector)
+            if intent is not None:
+                return intent
+        return self.keyword_intent(query)
+    
+    def keyword_intent(self, query: str) -> str:
+        """Keyword rules for intent"""
         query_lower = query.lower()
         
         if any(word in query_lower for word in ['đặt', 'gọi', 'order', 'thêm', 'cho tôi', 'muốn']):
@@ -43,22 +214,69 @@ class FoodOrderChatbot:
         else:
             return 'general'
     
-    def extract_items_from_query(self, query: str) -> List[str]:
+    def extract_items_from_query(self, query: str, rag: RAGSystem = None) -> List[str]:
         """Extract food items from query"""
-        # Simple extraction - can be improved with NER
-        items = []
-        for item in self.rag.menu_items:
-            if item['name'].lower() in query.lower():
-                items.append(item['name'])
-        return items
+        rag = rag or self.rag
+        return [item.name for item in rag.catalog.mentioned_in(query)]
+    
+    def extract_order_lines(self, query: str, rag: RAGSystem = None) -> List[DishMention]:
+        """Dishes named in the query with their quantities ("Thêm 2 ly cà phê sữa đá")"""
+        rag = rag or self.rag
+        return rag.catalog.extract_mentions(query)
+    
+    def extract_search_filters(self, query: str) -> Dict:
+        """Pull category and price bounds out of a query for filtered search"""
+        query_lower = query.lower()
+        filters = {}
+        
+        categories = [category for phrase, category in CATEGORY_HINTS.items() if phrase in query_lower]
+        if categories:
+            filters['category'] = categories
+        
+        for match in PRICE_BOUND.finditer(query_lower):
+            word, amount, unit, upper_amount, upper_unit = match.groups()
+            if not (upper_unit if upper_amount else unit):
+                following = _NEXT_WORD.match(query_lower, match.end())
+                if following is not None and following.group(1) not in PRICE_TRAILERS:
+                    continue
+            if upper_amount:
+                # "từ 30 đến 50k": the unit of the upper bound applies to both
+                filters['min_price'] = self._price(amount, unit or upper_unit)
+                filters['max_price'] = self._price(upper_amount, upper_unit)
+            elif word in ('trên', 'từ'):
+                filters['min_price'] = self._price(amount, unit)
+            else:
+                filters['max_price'] = self._price(amount, unit)
+        
+        return filters
+    
+    @staticmethod
+    def _price(amount: str, unit: Optional[str]) -> int:
+        """Price in đồng from a matched amount and unit"""
+        if re.fullmatch(r"\d+(?:[.,]\d{3})+", amount):
+            value = float(re.sub(r"[.,]", "", amount))     # thousands separators
+        else:
+            value = float(amount.replace(',', '.'))          # "1,5 triệu"
+        if unit in ('triệu', 'tr'):
+            value *= 1_000_000
+        elif unit in ('k', 'nghìn', 'ngàn') or (unit is None and value < 1000):
+            value *= 1000
+        return int(value)
     
     def handle_order(self, query: str, session: Dict) -> str:
         """Handle order intent"""
-        items = self.extract_items_from_query(query)
+        rag = self.get_rag(session)
+        mentions = self.extract_order_lines(query, rag)
         
-        if not items:
+        if not mentions:
+            if not self._can_use('rag', session):
+                return ("Hệ thống tìm kiếm món đang khởi động. Bạn có thể xem menu "
+                        "hoặc gọi đúng tên món nhé!")
+            
             # Use RAG to find similar items
-            results = self.rag.search(query, top_k=3)
+            results = rag.search(query, top_k=3, **self.extract_search_filters(query))
+            if not results:
+                return "Xin lỗi, không có món nào phù hợp với yêu cầu của bạn."
             response = "Tôi tìm thấy các món sau trong menu:\n\n"
             for item in results:
                 response += f"• {item['name']} - {item['price']:,}đ\n  {item['description']}\n\n"
@@ -66,19 +284,16 @@ class FoodOrderChatbot:
             return response
         
         # Add items to cart
-        for item_name in items:
-            item = self.rag.get_item_by_name(item_name)
-            if item:
-                session['cart'].append(item)
+        cart = session['cart']
+        for mention in mentions:
+            cart.add(mention.item, mention.quantity)
         
         # Generate confirmation
         response = "Đã thêm vào giỏ hàng:\n\n"
-        total = 0
-        for item in session['cart']:
-            response += f"• {item['name']} - {item['price']:,}đ\n"
-            total += item['price']
+        for item, quantity, subtotal in cart.lines():
+            response += f"• {item['name']} x{quantity} - {subtotal:,}đ\n"
         
-        response += f"\nTổng cộng: {total:,}đ\n"
+        response += f"\nTổng cộng: {cart.total:,}đ\n"
         response += "Bạn có muốn đặt thêm món nào không?"
         
         return response
@@ -88,16 +303,28 @@ class FoodOrderChatbot:
         if not session['cart']:
             return "Giỏ hàng của bạn đang trống. Vui lòng chọn món trước khi xác nhận."
         
-        total = sum(item['price'] for item in session['cart'])
-        order_id = self.db.create_order(session_id, session['cart'], total)
+        cart = session['cart']
+        total = cart.total
+        order_id = self.db.create_order(session_id, cart.order_items(), total)
         
         session['current_order_id'] = order_id
-        session['cart'] = []
+        cart.clear()
         
         return f"✓ Đơn hàng #{order_id} đã được tạo thành công!\nTổng tiền: {total:,}đ\nChúng tôi sẽ chuẩn bị món ăn ngay. Cảm ơn bạn!"
     
     def handle_cancel(self, query: str, session: Dict) -> str:
-        """Handle cancel intent"""
+        """Handle cancel intent; naming dishes in the cart takes them out instead ("bỏ 2 phở bò")"""
+        cart = session['cart']
+        if cart:
+            removed = []
+            for mention in self.extract_order_lines(query, self.get_rag(session)):
+                if mention.item['id'] in cart:
+                    count = cart.remove(mention.item['id'], mention.quantity)
+                    removed.append(f"• {mention.item['name']} x{count}")
+            if removed:
+                return ("Đã bỏ khỏi giỏ hàng:\n" + "\n".join(removed) +
+                        f"\n\nTổng cộng: {cart.total:,}đ")
+        
         if session['current_order_id']:
             success = self.db.cancel_order(session['current_order_id'])
             if success:
@@ -109,53 +336,140 @@ class FoodOrderChatbot:
         else:
             return "Bạn chưa có đơn hàng nào để hủy."
     
-    def handle_soup_dishes(self, query: str) -> str:
+    def handle_soup_dishes(self, query: str, rag: RAGSystem = None, locale: str = 'vi') -> str:
         """Handle request for soup/liquid dishes"""
-        soup_items = []
-        keywords = ['phở', 'bún', 'hủ tiếu', 'canh', 'lẩu', 'súp', 'miến', 'bánh canh']
+        rag = rag or self.rag
+        return self.menu_responses.get(rag.catalog, 'soup', locale)
+    
+    def handle_menu_info(self, query: str, rag: RAGSystem = None, locale: str = 'vi') -> str:
+        """Handle menu information requests; a named category gets its full, paginated listing"""
+        rag = rag or self.rag
+        query_lower = query.lower()
         
-        for item in self.rag.menu_items:
-            if any(keyword in item['name'].lower() for keyword in keywords):
-                soup_items.append(item)
+        for phrase, category in CATEGORY_HINTS.items():
+            if phrase in query_lower and category in rag.catalog.by_category:
+                page = PAGE_NUMBER.search(query_lower)
+                key = MenuResponseCache.category_key(category, int(page.group(1)) if page else 1)
+                response = self.menu_responses.get(rag.catalog, key, locale)
+                if response is not None:
+                    return response
+                break
         
-        if not soup_items:
-            return "Xin lỗi, hiện tại chúng tôi không có món nước nào."
+        return self.menu_responses.get(rag.catalog, 'menu', locale)
+    
+    def chat(self, message: str, session_id: str = None, restaurant_id: str = None,
+             use_cache: bool = True) -> Tuple[str, str]:
+        """Main chat function; use_cache=False always asks the LLM for general questions
         
-        response = "🍜 Các món có nước trong menu:\n\n"
-        for item in soup_items[:8]:  # Limit to 8 items
-            response += f"• {item['name']:<25} {item['price']:>8,}đ\n  {item['description']}\n\n"
+        Rule-based intents run right away on the calling thread; general questions
+        wait for an LLM worker. Requests of one session are handled one at a time.
+        """
+        if not session_id:
+            session_id = str(uuid.uuid4())
         
-        response += "Bạn muốn đặt món nào ạ?"
-        return response
-    
-    def handle_menu_info(self, query: str) -> str:
-        """Handle menu information requests"""
-        # Show by categories
-        categories = {}
-        for item in self.rag.menu_items:
-            cat = item['category']
-            if cat not in categories:
-                categories[cat] = []
-            categories[cat].append(item)
-        
-        response = "📋 THỰC ĐƠN NHÀ HÀNG\n\n"
-        
-        for category, items in list(categories.items())[:3]:  # Show 3 categories
-            response += f"▸ {category.upper()}\n"
-            for item in items[:5]:  # 5 items per category
-                response += f"  • {item['name']:<22} {item['price']:>8,}đ\n"
-            response += "\n"
-        
-        response += "Bạn muốn biết thêm về món nào hoặc muốn đặt món không ạ?"
-        return response
+        restaurant_id, intent = self._route(message, session_id, restaurant_id)
+        respond = lambda: self._respond(message, session_id, restaurant_id, intent, use_cache)
+        
+        if intent in RULE_INTENTS:
+            return self.scheduler.run_fast(session_id, respond), session_id
+        try:
+            return self.scheduler.run_llm(session_id, respond), session_id
+        except queue.Full:
+            return BUSY_MESSAGE, session_id
     
-    def chat(self, message: str, session_id: str = None) -> Tuple[str, str]:
-        """Main chat function"""
+    async def achat(self, message: str, session_id: str = None, restaurant_id: str = None,
+                    use_cache: bool = True) -> Tuple[str, str]:
+        """chat() for asyncio callers: nothing blocking runs on the event loop
+        
+        Session loads, intent parsing and rule-based handlers (including SQLite
+        order writes) run in io_pool; general questions are awaited from the
+        LLM worker queue.
+        """
         if not session_id:
             session_id = str(uuid.uuid4())
+        loop = asyncio.get_running_loop()
+        
+        restaurant_id, intent = await loop.run_in_executor(self.io_pool, self._route, message, session_id, restaurant_id)
+        respond = lambda: self._respond(message, session_id, restaurant_id, intent, use_cache)
+        
+        if intent in RULE_INTENTS:
+            response = await loop.run_in_executor(self.io_pool, self.scheduler.run_fast, session_id, respond)
+            return response, session_id
+        try:
+            return await asyncio.wrap_future(self.scheduler.submit_llm(session_id, respond)), session_id
+        except queue.Full:
+            return BUSY_MESSAGE, session_id
+    
+    def chat_stream(self, message: str, session_id: str, restaurant_id: str = None,
+                    use_cache: bool = True) -> Iterator[str]:
+        """chat() that yields the response so far as the LLM writes it; the last value is the full response"""
+        restaurant_id, intent = self._route(message, session_id, restaurant_id)
+        if intent in RULE_INTENTS:
+            yield self.scheduler.run_fast(
+                session_id, lambda: self._respond(message, session_id, restaurant_id, intent, use_cache))
+            return
+        
+        deltas = queue.Queue()
+        try:
+            future = self.scheduler.submit_llm(
+                session_id, lambda: self._respond(message, session_id, restaurant_id, intent, use_cache, deltas.put))
+        except queue.Full:
+            yield BUSY_MESSAGE
+            return
+        future.add_done_callback(lambda _: deltas.put(None))
+        
+        partial = ""
+        for delta in iter(deltas.get, None):
+            partial += delta
+            yield partial
+        yield future.result()
+    
+    async def achat_stream(self, message: str, session_id: str, restaurant_id: str = None,
+                           use_cache: bool = True) -> AsyncIterator[str]:
+        """chat_stream() for asyncio callers"""
+        loop = asyncio.get_running_loop()
+        restaurant_id, intent = await loop.run_in_executor(self.io_pool, self._route, message, session_id, restaurant_id)
+        if intent in RULE_INTENTS:
+            yield await loop.run_in_executor(
+                self.io_pool, self.scheduler.run_fast, session_id,
+                lambda: self._respond(message, session_id, restaurant_id, intent, use_cache))
+            return
         
+        deltas = asyncio.Queue()
+        put = lambda delta: loop.call_soon_threadsafe(deltas.put_nowait, delta)
+        try:
+            future = self.scheduler.submit_llm(
+                session_id, lambda: self._respond(message, session_id, restaurant_id, intent, use_cache, put))
+        except queue.Full:
+            yield BUSY_MESSAGE
+            return
+        future.add_done_callback(lambda _: put(None))
+        
+        partial = ""
+        while True:
+            delta = await deltas.get()
+            if delta is None:
+                break
+            partial += delta
+            yield partial
+        yield future.result()
+    
+    def _route(self, message: str, session_id: str, restaurant_id: Optional[str]) -> Tuple[str, str]:
+        """Restaurant the message is for and its intent"""
+        restaurant_id = restaurant_id or self.get_session(session_id)['restaurant_id']
+        return restaurant_id, self.parse_intent(message, {'restaurant_id': restaurant_id})
+    
+    def _respond(self, message: str, session_id: str, restaurant_id: str, intent: str, use_cache: bool,
+                 on_delta: Callable[[str], None] = None) -> str:
+        """Answer one message and record it; runs while holding the session
+        
+        With on_delta, LLM output is streamed to it piece by piece as it is generated.
+        """
         session = self.get_session(session_id)
-        intent = self.parse_intent(message)
+        if restaurant_id != session['restaurant_id']:
+            # Switching restaurant: the cart belonged to the previous menu
+            session['restaurant_id'] = restaurant_id
+            session['cart'] = Cart()
         
         # Handle specific intents without LLM (faster, more accurate)
         if intent == 'order':
@@ -165,23 +479,25 @@ class FoodOrderChatbot:
         elif intent == 'cancel':
             response = self.handle_cancel(message, session)
         elif intent == 'view_cart':
-            if session['cart']:
+            cart = session['cart']
+            if cart:
                 response = "🛒 Giỏ hàng của bạn:\n\n"
-                total = 0
-                for item in session['cart']:
-                    response += f"• {item['name']:<25} {item['price']:>8,}đ\n"
-                    total += item['price']
-                response += f"\n💰 Tổng cộng: {total:,}đ\n\n"
+                for item, quantity, subtotal in cart.lines():
+                    response += f"• {item['name']:<22} x{quantity:<3} {subtotal:>8,}đ\n"
+                response += f"\n💰 Tổng cộng: {cart.total:,}đ\n\n"
                 response += "Bạn muốn đặt thêm hoặc xác nhận đơn hàng không?"
             else:
                 response = "Giỏ hàng của bạn đang trống. Hãy chọn món từ menu nhé!"
         elif intent == 'menu_info':
-            response = self.handle_menu_info(message)
+            response = self.handle_menu_info(message, self.get_rag(session), session['locale'])
         elif intent == 'soup_dishes':
-            response = self.handle_soup_dishes(message)
+            response = self.handle_soup_dishes(message, self.get_rag(session), session['locale'])
         else:
             # Use RAG + LLM for general queries (improved)
-            relevant_items = self.rag.search(message, top_k=3)
+            relevant_items = []
+            rag_ready = self._can_use('rag', session)
+            if rag_ready:
+                relevant_items = self.get_rag(session).search(message, top_k=3, **self.extract_search_filters(message))
             
             if relevant_items:
                 context = "Các món phù hợp:\n"
@@ -190,8 +506,35 @@ class FoodOrderChatbot:
             else:
                 context = ""
             
-            prompt = self.llm.create_prompt(context, message, session['chat_history'])
-            llm_response = self.llm.generate_response(prompt, max_length=150)
+            # The query vector is already cached from intent parsing and retrieval. The prompt also
+            # carries the previous turn, so answers are only shared between matching histories
+            cache_key = None
+            llm_response = None
+            if use_cache and rag_ready:
+                rag = self.get_rag(session)
+                last_turn = session['chat_history'][-1] if session['chat_history'] else None
+                cache_key = (rag.embed_query(message), rag.menu_version, [item['id'] for item in relevant_items])
+                cache_context = f"{last_turn['user']}\n{last_turn['assistant']}" if last_turn else ''
+                llm_response = self.response_cache.get(*cache_key, context=cache_context)
+            
+            if llm_response is None:
+                if self._can_use('llm'):
+                    prompt = self.llm.create_prompt(context, message, session['chat_history'])
+                    budget = LLM_TOKEN_BUDGETS.get(intent, DEFAULT_TOKEN_BUDGET)
+                    if on_delta is None:
+                        llm_response = self.llm.generate_response(prompt, max_length=budget)
+                    else:
+                        llm_response = ""
+                        for delta in self.llm.stream_response(prompt, max_length=budget):
+                            llm_response += delta
+                            on_delta(delta)
+                        llm_response = llm_response.strip()
+                    # Only real answers are reused; an empty or failed generation is retried next time
+                    if cache_key is not None and len(llm_response) >= 10 and llm_response != FALLBACK_RESPONSE:
+                        self.response_cache.put(*cache_key, llm_response, context=cache_context)
+                else:
+                    # LLM still warming up: answer from retrieval alone
+                    llm_response = ""
             
             # If LLM response is poor or empty, provide fallback
             if len(llm_response) < 10:
@@ -215,4 +558,5 @@ class FoodOrderChatbot:
         if len(session['chat_history']) > 10:
             session['chat_history'] = session['chat_history'][-10:]
         
-        return response, session_id
+        self.sessions.save(session_id, session)
+        return response
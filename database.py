@@ -27,15 +27,15 @@ class Database:
         conn.commit()
         conn.close()
     
-    def create_order(self, session_id: str, items: List[Dict], total_price: float) -> int:
-        """Create a new order"""
+    def create_order(self, session_id: str, items: List[list], total_price: float) -> int:
+        """Create a new order from compact [item id, quantity, unit price] rows (Cart.order_items())"""
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
         cursor.execute("""
             INSERT INTO orders (session_id, items, total_price, status)
             VALUES (?, ?, ?, ?)
-        """, (session_id, json.dumps(items), total_price, "pending"))
+        """, (session_id, json.dumps(items, separators=(',', ':')), total_price, "pending"))
         
         order_id = cursor.lastrowid
         conn.commit()
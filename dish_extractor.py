@@ -0,0 +1,228 @@
+import re
+import unicodedata
+from collections import Counter, deque
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+from text_utils import fold_accents
+
+_WHITESPACE = re.compile(r"\s+")
+
+NUMBER_WORDS = {
+    'một': 1, 'hai': 2, 'ba': 3, 'bốn': 4, 'tư': 4, 'năm': 5,
+    'sáu': 6, 'bảy': 7, 'tám': 8, 'chín': 9
+}
+# "mười" (ten) and "mươi" (tens, as in "hai mươi") fold to the same text
+TEN = 'mười'
+# Ones after a ten take these forms too: "hai mươi mốt", "mười lăm"
+ONES_AFTER_TEN = dict(NUMBER_WORDS, **{'mốt': 1, 'lăm': 5, 'nhăm': 5})
+UNITS = (
+    'ly', 'cốc', 'tô', 'bát', 'phần', 'suất', 'xuất', 'đĩa', 'dĩa', 'chai', 'lon',
+    'cái', 'chén', 'ổ', 'hộp', 'ấm', 'nồi', 'con', 'miếng', 'cuốn'
+)
+
+# Quantity parsing runs on accent-folded text, so both "hai" and "mười"/"muoi" work
+_FOLDED_NUMBERS = {fold_accents(word): value for word, value in NUMBER_WORDS.items()}
+_FOLDED_ONES = {fold_accents(word): value for word, value in ONES_AFTER_TEN.items()}
+_FOLDED_TEN = fold_accents(TEN)
+_FOLDED_UNITS = {fold_accents(unit): unit for unit in UNITS}
+
+
+def _alternation(words: Iterable[str]) -> str:
+    return '|'.join(sorted(words, key=len, reverse=True))
+
+
+# "12", "mười hai", "hai mươi", "hai mươi lăm", "hai"
+_NUMBER = r"\d+|(?:(?:{digits})\s+)?{ten}(?:\s+(?:{ones}))?|{digits}".format(
+    digits=_alternation(_FOLDED_NUMBERS), ten=_FOLDED_TEN, ones=_alternation(_FOLDED_ONES)
+)
+_UNIT = _alternation(_FOLDED_UNITS)
+_QUANTITY_BEFORE = re.compile(
+    r"(?:(?<!\w)({number})\s*)?(?:(?<!\w)({units})\s*)?$".format(number=_NUMBER, units=_UNIT)
+)
+# "x2" or "2 phần" right after the dish
+_QUANTITY_AFTER = re.compile(
+    r"^\s*(?:[x×]\s*(\d+)|({number})\s*({units}))(?!\w)".format(number=_NUMBER, units=_UNIT)
+)
+
+
+def _parse_number(words: str) -> int:
+    """Value of digits or an accent-folded Vietnamese numeral up to 99 ("hai muoi lam" -> 25)"""
+    if words.isdigit():
+        return int(words)
+    tokens = words.split()
+    if _FOLDED_TEN not in tokens:
+        return _FOLDED_NUMBERS[tokens[0]]
+    ten = tokens.index(_FOLDED_TEN)
+    tens = _FOLDED_NUMBERS[tokens[0]] if ten else 1
+    ones = _FOLDED_ONES[tokens[ten + 1]] if ten + 1 < len(tokens) else 0
+    return tens * 10 + ones
+
+
+class DishMention(NamedTuple):
+    item: object
+    quantity: int
+    unit: Optional[str]
+    start: int
+    end: int
+
+
+def _fold_aligned(text: str) -> str:
+    """Accent-fold character by character so positions line up with the input"""
+    folded = []
+    for ch in text:
+        base = fold_accents(ch)
+        folded.append(base if len(base) == 1 else (base[:1] or ' '))
+    return ''.join(folded)
+
+
+def _normalize(text: str) -> str:
+    return _WHITESPACE.sub(' ', unicodedata.normalize('NFC', text).lower())
+
+
+class _Automaton:
+    """Aho-Corasick automaton over characters"""
+
+    def __init__(self):
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [[]]
+
+    def add(self, pattern: str, value):
+        node = 0
+        for ch in pattern:
+            nxt = self.goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto.append({})
+                self.fail.append(0)
+                self.out.append([])
+                self.goto[node][ch] = nxt
+            node = nxt
+        self.out[node].append((len(pattern), value))
+
+    def build(self):
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self.goto[node].items():
+                queue.append(nxt)
+                fallback = self.fail[node]
+                while fallback and ch not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                target = self.goto[fallback].get(ch, 0)
+                self.fail[nxt] = target if target != nxt else 0
+                self.out[nxt] = self.out[nxt] + self.out[self.fail[nxt]]
+
+    def find(self, text: str):
+        """Yield (start, end, value) for every pattern occurrence"""
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in self.goto[node]:
+                node = self.fail[node]
+            node = self.goto[node].get(ch, 0)
+            for length, value in self.out[node]:
+                yield i - length + 1, i + 1, value
+
+
+class DishExtractor:
+    """Finds every dish mention, with quantity and unit, in one pass over a message
+
+    Patterns are dish names, unique name prefixes of two or more syllables
+    ("bún chả" for "Bún Chả Hà Nội") and any extra aliases, matched on
+    accent-folded text. Accents the user did type must agree with the dish name.
+    """
+
+    def __init__(self, items: Iterable, aliases: Optional[Dict[str, List[str]]] = None):
+        items = list(items)
+        aliases = aliases or {}
+        self._automaton = _Automaton()
+        seen = set()
+
+        # How many dishes each leading run of syllables could refer to
+        prefix_counts = Counter()
+        for item in items:
+            words = _fold_aligned(_normalize(item['name'])).split(' ')
+            prefix_counts.update(' '.join(words[:size]) for size in range(2, len(words) + 1))
+
+        for item in items:
+            for pattern in self._patterns(item, prefix_counts, aliases.get(item['id'], ())):
+                folded = _fold_aligned(pattern)
+                if folded in seen:
+                    continue
+                seen.add(folded)
+                self._automaton.add(folded, (item, pattern))
+        self._automaton.build()
+
+    @staticmethod
+    def _patterns(item, prefix_counts: Counter, extra: Iterable[str]) -> List[str]:
+        name = _normalize(item['name'])
+        patterns = [name] + [_normalize(alias) for alias in extra]
+
+        # Unambiguous leading syllables work as short names
+        words = name.split(' ')
+        for size in range(len(words) - 1, 1, -1):
+            prefix = ' '.join(words[:size])
+            if prefix_counts[_fold_aligned(prefix)] == 1:
+                patterns.append(prefix)
+        return patterns
+
+    @staticmethod
+    def _accents_agree(typed: str, pattern: str) -> bool:
+        """Unaccented characters match anything; accented ones must be exact"""
+        folded_typed = _fold_aligned(typed)
+        return all(t == f or t == p for t, f, p in zip(typed, folded_typed, pattern))
+
+    def extract(self, text: str) -> List[DishMention]:
+        """Leftmost-longest, non-overlapping dish mentions in order of appearance"""
+        text = _normalize(text)
+        folded = _fold_aligned(text)
+
+        candidates = []
+        for start, end, (item, pattern) in self._automaton.find(folded):
+            if start > 0 and folded[start - 1].isalnum():
+                continue
+            if end < len(folded) and folded[end].isalnum():
+                continue
+            if not self._accents_agree(text[start:end], pattern):
+                continue
+            candidates.append((start, end, item))
+        candidates.sort(key=lambda c: (c[0], c[0] - c[1]))
+
+        mentions = []
+        last_end = segment_start = 0
+        for start, end, item in candidates:
+            if start < last_end:
+                continue
+            quantity, unit, segment_start = self._quantity(folded, segment_start, start, end)
+            mentions.append(DishMention(item, quantity, unit, start, end))
+            last_end = end
+        return mentions
+
+    @staticmethod
+    def _quantity(folded: str, segment_start: int, start: int, end: int):
+        """(quantity, unit, end of the quantity text) for one dish
+
+        The quantity comes just before the dish ("2 ly", "mười hai") or right
+        after it ("x2", or "2 phần" when nothing came before). Text consumed
+        after the dish is not read again as the next dish's quantity.
+        """
+        quantity, unit = 1, None
+        before = _QUANTITY_BEFORE.search(folded[segment_start:start])
+        number, unit_word = before.groups() if before is not None else (None, None)
+        if number:
+            quantity = _parse_number(number)
+        if unit_word:
+            unit = _FOLDED_UNITS[unit_word]
+
+        after = _QUANTITY_AFTER.match(folded[end:])
+        if after is None:
+            return max(quantity, 1), unit, end
+        times, trailing_number, trailing_unit = after.groups()
+        if times:
+            quantity = int(times)
+        elif number or unit_word:
+            # "1 phở bò 2 phần bún chả": the trailing "2 phần" is the next dish's
+            return max(quantity, 1), unit, end
+        else:
+            quantity, unit = _parse_number(trailing_number), _FOLDED_UNITS[trailing_unit]
+        return max(quantity, 1), unit, end + after.end()
@@ -0,0 +1,91 @@
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+import torch
+from sentence_transformers import SentenceTransformer
+
+EMBEDDING_BACKENDS = ('default', 'int8')
+
+
+def backend_cache_name(model_name: str, backend: str) -> str:
+    """Name that identifies the vectors a backend produces (used in snapshot keys)"""
+    return model_name if backend == 'default' else f"{model_name}@{backend}"
+
+
+class EmbeddingBackend:
+    """SentenceTransformer wrapper tuned for CPU inference
+
+    'int8' dynamically quantizes every nn.Linear to int8 weights (activations are
+    quantized on the fly). Encoding always runs under torch.inference_mode.
+    num_threads sets torch's intra-op thread count, which is process-wide.
+    """
+
+    def __init__(self, model_name: str, backend: str = 'default', num_threads: Optional[int] = None,
+                 device: Optional[str] = None):
+        if backend not in EMBEDDING_BACKENDS:
+            raise ValueError(f"backend must be one of {EMBEDDING_BACKENDS}, got {backend!r}")
+        if num_threads:
+            torch.set_num_threads(num_threads)
+
+        # Dynamic quantization only runs on CPU
+        if device is None:
+            device = 'cuda' if torch.cuda.is_available() and backend == 'default' else 'cpu'
+
+        self.backend = backend
+        self.cache_name = backend_cache_name(model_name, backend)
+        self.model = SentenceTransformer(model_name, device=device)
+        if backend == 'int8':
+            torch.quantization.quantize_dynamic(self.model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+        self.model.eval()
+
+    def encode(self, texts: List[str], **kwargs) -> np.ndarray:
+        """Same contract as SentenceTransformer.encode"""
+        with torch.inference_mode():
+            return self.model.encode(texts, **kwargs)
+
+
+def _timed_encode(backend: EmbeddingBackend, texts: List[str], batch_size: int):
+    backend.encode(texts[:batch_size], batch_size=batch_size)  # warm-up
+    start = time.perf_counter()
+    embeddings = backend.encode(texts, batch_size=batch_size, convert_to_numpy=True, normalize_embeddings=True)
+    return embeddings.astype('float32'), time.perf_counter() - start
+
+
+def compare_backends(model_name: str, texts: List[str], backend: str = 'int8', k: int = 5,
+                     num_threads: Optional[int] = None, batch_size: int = 32) -> Dict:
+    """Accuracy and latency of a backend against the fp32 model on the same texts
+
+    Accuracy is the cosine similarity between paired embeddings and the overlap
+    of each text's top-k neighbours within the corpus.
+    """
+    reference = EmbeddingBackend(model_name, 'default', num_threads, device='cpu')
+    candidate = EmbeddingBackend(model_name, backend, num_threads, device='cpu')
+
+    expected, reference_seconds = _timed_encode(reference, texts, batch_size)
+    actual, candidate_seconds = _timed_encode(candidate, texts, batch_size)
+
+    similarity = (expected * actual).sum(axis=1)
+
+    k = min(k, len(texts) - 1)
+    overlap = 1.0
+    if k > 0:
+        def neighbours(vectors):
+            scores = vectors @ vectors.T
+            np.fill_diagonal(scores, -np.inf)
+            return np.argsort(-scores, axis=1)[:, :k]
+        overlap = float(np.mean([
+            len(set(a) & set(b)) / k for a, b in zip(neighbours(expected), neighbours(actual))
+        ]))
+
+    return {
+        'backend': backend,
+        'texts': len(texts),
+        'threads': torch.get_num_threads(),
+        'fp32_ms_per_text': reference_seconds * 1000 / len(texts),
+        f'{backend}_ms_per_text': candidate_seconds * 1000 / len(texts),
+        'speedup': reference_seconds / candidate_seconds if candidate_seconds else float('inf'),
+        'mean_cosine': float(similarity.mean()),
+        'min_cosine': float(similarity.min()),
+        f'top{k}_overlap': overlap
+    }
@@ -0,0 +1,130 @@
+import time
+from typing import Dict, List, Optional
+
+import faiss
+import numpy as np
+
+COMPRESSION_MODES = ('none', 'fp16', 'int8', 'pca')
+
+# FAISS scalar quantizer matching each storage mode
+SCALAR_TYPES = {'fp16': faiss.ScalarQuantizer.QT_fp16, 'int8': faiss.ScalarQuantizer.QT_8bit}
+
+
+class EmbeddingCodec:
+    """Trained once per index build; maps float32 embeddings to compact storage
+
+    'fp16' halves storage, 'int8' stores per-dimension min/scale quantized codes,
+    'pca' projects onto `pca_dim` principal components. Vectors handed to FAISS
+    live in "index space": the PCA-projected space for 'pca', the original one
+    otherwise.
+    """
+
+    def __init__(self, mode: str = 'none', pca_dim: int = 256, normalize: bool = False):
+        if mode not in COMPRESSION_MODES:
+            raise ValueError(f"compression must be one of {COMPRESSION_MODES}, got {mode!r}")
+        self.mode = mode
+        self.pca_dim = pca_dim
+        self.normalize = normalize
+        self.params = {}    # trained arrays, stored in the snapshot
+
+    def train(self, vectors: np.ndarray):
+        """Fit quantization ranges or the PCA projection"""
+        if self.mode == 'int8':
+            low = vectors.min(axis=0)
+            scale = (vectors.max(axis=0) - low) / 255.0
+            self.params = {'low': low.astype('float32'), 'scale': np.maximum(scale, 1e-12).astype('float32')}
+        elif self.mode == 'pca':
+            pca = faiss.PCAMatrix(vectors.shape[1], min(self.pca_dim, vectors.shape[1], len(vectors)))
+            pca.train(vectors)
+            components = faiss.vector_to_array(pca.A).reshape(pca.d_out, pca.d_in)
+            self.params = {'mean': faiss.vector_to_array(pca.mean).astype('float32'),
+                           'components': components.astype('float32')}
+
+    def to_index_space(self, vectors: np.ndarray) -> np.ndarray:
+        """Project float32 vectors (documents or queries) for FAISS"""
+        if self.mode != 'pca':
+            return vectors
+        projected = np.ascontiguousarray((vectors - self.params['mean']) @ self.params['components'].T)
+        if self.normalize:
+            faiss.normalize_L2(projected)
+        return projected
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        """float32 vectors -> stored representation"""
+        if self.mode == 'fp16':
+            return vectors.astype('float16')
+        if self.mode == 'int8':
+            codes = np.rint((vectors - self.params['low']) / self.params['scale'])
+            return np.clip(codes, 0, 255).astype('uint8')
+        return self.to_index_space(vectors)
+
+    def decode(self, stored: np.ndarray) -> np.ndarray:
+        """Stored representation -> float32 vectors in index space"""
+        if self.mode == 'fp16':
+            return stored.astype('float32')
+        if self.mode == 'int8':
+            return np.ascontiguousarray(stored * self.params['scale'] + self.params['low'], dtype='float32')
+        return stored
+
+    def state(self) -> Dict[str, np.ndarray]:
+        """Arrays to persist next to the index"""
+        return {f"codec_{name}": value for name, value in self.params.items()}
+
+    def load_state(self, arrays: Dict[str, np.ndarray]):
+        """Restore trained parameters from snapshot arrays"""
+        self.params = {name[len('codec_'):]: value for name, value in arrays.items() if name.startswith('codec_')}
+
+
+def _exact_index(vectors: np.ndarray, cosine: bool):
+    index = faiss.IndexFlatIP(vectors.shape[1]) if cosine else faiss.IndexFlatL2(vectors.shape[1])
+    index.add(vectors)
+    return index
+
+
+def compression_report(embeddings: np.ndarray, queries: np.ndarray, modes: Optional[List[str]] = None,
+                       k: int = 10, pca_dim: int = 256, cosine: bool = False,
+                       keeps_vectors: bool = False) -> List[Dict]:
+    """Memory, search latency and recall@k of each mode against float32 exact search
+
+    `embeddings` and `queries` are uncompressed float32 (normalized if cosine).
+    Each mode is measured as the stored vector representation plus an exact
+    index built over it. `resident_bytes` is what one worker holds: the index,
+    plus the stored vectors when the index keeps its own copy (keeps_vectors,
+    i.e. HNSW).
+    """
+    modes = modes or list(COMPRESSION_MODES)
+    k = min(k, len(embeddings))
+    baseline = _exact_index(embeddings, cosine)
+    _, truth = baseline.search(queries, k)
+
+    report = []
+    for mode in modes:
+        codec = EmbeddingCodec(mode, pca_dim=pca_dim, normalize=cosine)
+        codec.train(embeddings)
+        stored = codec.encode(embeddings)
+
+        if mode in SCALAR_TYPES:
+            metric = faiss.METRIC_INNER_PRODUCT if cosine else faiss.METRIC_L2
+            index = faiss.IndexScalarQuantizer(embeddings.shape[1], SCALAR_TYPES[mode], metric)
+            index.train(embeddings)
+            index.add(embeddings)
+        else:
+            index = _exact_index(codec.decode(stored), cosine)
+
+        mode_queries = codec.to_index_space(queries.copy())
+        start = time.perf_counter()
+        _, found = index.search(mode_queries, k)
+        latency_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+        hits = sum(len(set(t) & set(f)) for t, f in zip(truth, found))
+        index_bytes = int(faiss.serialize_index(index).nbytes)
+        report.append({
+            'mode': mode,
+            'dimension': int(index.d),
+            'vector_bytes': int(stored.nbytes),
+            'index_bytes': index_bytes,
+            'resident_bytes': index_bytes + (int(stored.nbytes) if keeps_vectors else 0),
+            'latency_ms': latency_ms,
+            f'recall@{k}': hits / (len(queries) * k)
+        })
+    return report
@@ -0,0 +1,117 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional
+
+
+class _Request:
+    __slots__ = ('prompt', 'max_new_tokens', 'on_delta', 'future', 'enqueued')
+
+    def __init__(self, prompt: str, max_new_tokens: int, on_delta: Optional[Callable[[str], None]]):
+        self.prompt = prompt
+        self.max_new_tokens = max_new_tokens
+        self.on_delta = on_delta
+        self.future = Future()
+        self.enqueued = time.monotonic()
+
+
+class GenerationBatcher:
+    """Coalesces concurrent generation requests into batched model calls
+
+    A single thread waits for the first request, keeps collecting for
+    `window_ms` or until `max_batch_size` requests are pending, then calls
+    run_batch(prompts, max_new_tokens, on_deltas) once and hands each caller
+    its output. Requests submitted with on_delta are streamed within the batch.
+    """
+
+    def __init__(self, run_batch: Callable[[List[str], List[int], List], List[str]],
+                 max_batch_size: int = 4, window_ms: float = 10.0, window: int = 1000):
+        self.run_batch = run_batch
+        self.max_batch_size = max_batch_size
+        self.window_ms = window_ms
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+
+        self._waits = deque(maxlen=window)
+        self.batches = 0
+        self.requests = 0
+        self.busy_seconds = 0.0
+
+        self._thread = threading.Thread(target=self._loop, name="generation-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, prompt: str, max_new_tokens: int, on_delta: Callable[[str], None] = None) -> Future:
+        """Queue a prompt; the Future resolves with the generated text, on_delta gets it as it is written"""
+        request = _Request(prompt, max_new_tokens, on_delta)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("GenerationBatcher is closed")
+            self._queue.append(request)
+            self._cond.notify()
+        return request.future
+
+    def generate(self, prompt: str, max_new_tokens: int) -> str:
+        """submit() and wait for the result"""
+        return self.submit(prompt, max_new_tokens).result()
+
+    def close(self):
+        """Finish queued requests, then stop the batching thread so run_batch (and its model) can be freed"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+
+    def _next_batch(self) -> List[_Request]:
+        """Next requests to run together; empty once closed and drained"""
+        with self._cond:
+            while not self._queue:
+                if self._closed:
+                    return []
+                self._cond.wait()
+            deadline = time.monotonic() + self.window_ms / 1000
+            while len(self._queue) < self.max_batch_size and not self._closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            return [self._queue.popleft() for _ in range(min(self.max_batch_size, len(self._queue)))]
+
+    def _loop(self):
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                return
+            start = time.monotonic()
+            try:
+                outputs = self.run_batch([r.prompt for r in batch], [r.max_new_tokens for r in batch],
+                                         [r.on_delta for r in batch])
+            except BaseException as e:
+                for request in batch:
+                    request.future.set_exception(e)
+                outputs = None
+            elapsed = time.monotonic() - start
+
+            with self._cond:
+                self.batches += 1
+                self.requests += len(batch)
+                self.busy_seconds += elapsed
+                self._waits.extend(start - r.enqueued for r in batch)
+            if outputs is not None:
+                for request, output in zip(batch, outputs):
+                    request.future.set_result(output)
+
+    def stats(self) -> Dict:
+        """Batch sizes, throughput while generating and queue wait"""
+        with self._cond:
+            waits = sorted(self._waits)
+            return {
+                'pending': len(self._queue),
+                'batches': self.batches,
+                'requests': self.requests,
+                'avg_batch_size': self.requests / self.batches if self.batches else 0.0,
+                'requests_per_sec': self.requests / self.busy_seconds if self.busy_seconds else 0.0,
+                'avg_wait_ms': 1000 * sum(waits) / len(waits) if waits else 0.0,
+                'p95_wait_ms': 1000 * waits[min(len(waits) - 1, int(0.95 * len(waits)))] if waits else 0.0
+            }
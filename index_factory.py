@@ -0,0 +1,218 @@
+import json
+import math
+from typing import Optional, Tuple
+
+import faiss
+import numpy as np
+
+from embedding_compression import COMPRESSION_MODES, SCALAR_TYPES
+
+INDEX_TYPES = ('auto', 'flat', 'ivf_flat', 'ivf_pq', 'hnsw')
+METRICS = ('l2', 'cosine')
+
+# Catalog sizes at which 'auto' moves to the next index type
+FLAT_MAX_VECTORS = 10_000
+IVF_FLAT_MAX_VECTORS = 200_000
+
+
+class IndexConfig:
+    """FAISS index type and its training/search parameters
+
+    metric='cosine' means inner product on L2-normalized vectors; the caller
+    is responsible for normalizing what it adds and searches.
+    """
+
+    def __init__(self, index_type: str = 'flat', metric: str = 'l2', nlist: int = None, nprobe: int = 8,
+                 pq_m: int = None, pq_nbits: int = 8, hnsw_m: int = 32, ef_construction: int = 80,
+                 ef_search: int = 64, min_recall: float = 0.95, compression: str = 'none', pca_dim: int = 256):
+        if index_type not in INDEX_TYPES:
+            raise ValueError(f"index_type must be one of {INDEX_TYPES}, got {index_type!r}")
+        if metric not in METRICS:
+            raise ValueError(f"metric must be one of {METRICS}, got {metric!r}")
+        if compression not in COMPRESSION_MODES:
+            raise ValueError(f"compression must be one of {COMPRESSION_MODES}, got {compression!r}")
+        self.index_type = index_type
+        self.metric = metric
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.pq_m = pq_m
+        self.pq_nbits = pq_nbits
+        self.hnsw_m = hnsw_m
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self.min_recall = min_recall
+        self.compression = compression
+        self.pca_dim = pca_dim
+
+    @property
+    def faiss_metric(self) -> int:
+        return faiss.METRIC_INNER_PRODUCT if self.metric == 'cosine' else faiss.METRIC_L2
+
+    @property
+    def scalar_qtype(self):
+        """FAISS scalar quantizer for fp16/int8 storage, else None"""
+        return SCALAR_TYPES.get(self.compression)
+
+    def fingerprint(self) -> str:
+        """Stable description of everything that changes the built index"""
+        build_fields = ('index_type', 'metric', 'nlist', 'pq_m', 'pq_nbits', 'hnsw_m', 'ef_construction',
+                        'compression', 'pca_dim')
+        return json.dumps({field: getattr(self, field) for field in build_fields}, sort_keys=True)
+
+
+def choose_index_type(n_vectors: int) -> str:
+    """Pick an index type for a catalog size"""
+    if n_vectors <= FLAT_MAX_VECTORS:
+        return 'flat'
+    if n_vectors <= IVF_FLAT_MAX_VECTORS:
+        return 'ivf_flat'
+    return 'ivf_pq'
+
+
+def default_nlist(n_vectors: int) -> int:
+    """~4*sqrt(n) lists, keeping at least 39 training points per list"""
+    return max(1, min(int(4 * math.sqrt(n_vectors)), n_vectors // 39))
+
+
+def default_pq_m(dimension: int) -> int:
+    """Largest usual sub-quantizer count that divides the dimension"""
+    for m in (64, 48, 32, 24, 16, 12, 8, 4, 2):
+        if dimension % m == 0:
+            return m
+    return 1
+
+
+def supports_remove(index_type: str) -> bool:
+    """HNSW graphs cannot drop vectors; they are rebuilt instead"""
+    return index_type != 'hnsw'
+
+
+def training_shortfall(index_type: str, config: IndexConfig, n_vectors: int, dimension: int) -> Optional[str]:
+    """Why `index_type` cannot be trained on this many vectors, or None if it can"""
+    if index_type not in ('ivf_flat', 'ivf_pq'):
+        return None
+    nlist = config.nlist or default_nlist(n_vectors)
+    if n_vectors < nlist:
+        return f"at least nlist={nlist} vectors to train, got {n_vectors}"
+    if index_type == 'ivf_pq':
+        pq_m = config.pq_m or default_pq_m(dimension)
+        if dimension % pq_m:
+            return f"pq_m={pq_m} to divide the dimension {dimension}"
+        if n_vectors < 2 ** config.pq_nbits:
+            return f"at least 2^pq_nbits={2 ** config.pq_nbits} vectors to train, got {n_vectors}"
+    return None
+
+
+def _flat(dimension: int, config: IndexConfig):
+    return faiss.IndexFlatIP(dimension) if config.metric == 'cosine' else faiss.IndexFlatL2(dimension)
+
+
+def create_index(config: IndexConfig, embeddings: np.ndarray, ids: np.ndarray) -> Tuple[object, str]:
+    """Build, train and fill an id-mapped index; returns (index, resolved index type)
+
+    A configured type that cannot be trained on this catalog (too few vectors
+    for nlist or the PQ codebooks) falls back to flat. With fp16/int8 compression the flat, IVF and HNSW variants store scalar
+    quantized codes; IVF-PQ is already compressed and ignores it.
+    """
+    n_vectors, dimension = embeddings.shape
+    index_type = config.index_type if config.index_type != 'auto' else choose_index_type(n_vectors)
+    shortfall = training_shortfall(index_type, config, n_vectors, dimension)
+    if shortfall is not None:
+        print(f"{index_type} index needs {shortfall}; using a flat index instead")
+        index_type = 'flat'
+    qtype = config.scalar_qtype
+
+    if index_type == 'flat':
+        if qtype is not None:
+            base = faiss.IndexScalarQuantizer(dimension, qtype, config.faiss_metric)
+        else:
+            base = _flat(dimension, config)
+    elif index_type == 'ivf_flat':
+        nlist = config.nlist or default_nlist(n_vectors)
+        if qtype is not None:
+            base = faiss.IndexIVFScalarQuantizer(_flat(dimension, config), dimension, nlist, qtype, config.faiss_metric)
+        else:
+            base = faiss.IndexIVFFlat(_flat(dimension, config), dimension, nlist, config.faiss_metric)
+    elif index_type == 'ivf_pq':
+        nlist = config.nlist or default_nlist(n_vectors)
+        pq_m = config.pq_m or default_pq_m(dimension)
+        base = faiss.IndexIVFPQ(_flat(dimension, config), dimension, nlist, pq_m, config.pq_nbits, config.faiss_metric)
+    elif qtype is not None:
+        base = faiss.IndexHNSWSQ(dimension, qtype, config.hnsw_m, config.faiss_metric)
+        base.hnsw.efConstruction = config.ef_construction
+    else:
+        base = faiss.IndexHNSWFlat(dimension, config.hnsw_m, config.faiss_metric)
+        base.hnsw.efConstruction = config.ef_construction
+
+    if not base.is_trained:
+        rng = np.random.default_rng(0)
+        max_train = 256 * base.nlist if isinstance(base, faiss.IndexIVF) else 100_000
+        n_train = min(n_vectors, max_train)
+        sample = embeddings[rng.choice(n_vectors, n_train, replace=False)] if n_train < n_vectors else embeddings
+        base.train(sample)
+
+    if isinstance(base, faiss.IndexIVF):
+        # Vectors are reconstructed by id instead of being kept next to the index
+        base.set_direct_map_type(faiss.DirectMap.Hashtable)
+    index = faiss.IndexIDMap2(base)
+    if n_vectors:
+        index.add_with_ids(embeddings, ids)
+    apply_search_params(index, config)
+    return index, index_type
+
+
+def apply_search_params(index, config: IndexConfig):
+    """Push nprobe / efSearch into the wrapped index"""
+    base = faiss.downcast_index(index.index)
+    if isinstance(base, faiss.IndexIVF):
+        base.nprobe = min(config.nprobe, base.nlist)
+    elif isinstance(base, faiss.IndexHNSW):
+        base.hnsw.efSearch = config.ef_search
+
+
+def search_params(index, config: IndexConfig, selector):
+    """Per-query search parameters carrying an id selector"""
+    base = faiss.downcast_index(index.index)
+    if isinstance(base, faiss.IndexIVF):
+        return faiss.SearchParametersIVF(sel=selector, nprobe=min(config.nprobe, base.nlist))
+    if isinstance(base, faiss.IndexHNSW):
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=config.ef_search)
+    return faiss.SearchParameters(sel=selector)
+
+
+def recall_at_k(index, embeddings: np.ndarray, ids: np.ndarray, config: IndexConfig,
+                k: int = 10, n_queries: int = 200) -> float:
+    """Recall@k of `index` against exact search, using stored vectors as queries"""
+    n_vectors = len(embeddings)
+    if n_vectors == 0:
+        return 1.0
+    k = min(k, n_vectors)
+    rng = np.random.default_rng(0)
+    queries = embeddings[rng.choice(n_vectors, min(n_queries, n_vectors), replace=False)]
+
+    exact = _flat(embeddings.shape[1], config)
+    exact.add(embeddings)
+    _, truth = exact.search(queries, k)
+    _, found = index.search(queries, k)
+
+    hits = sum(len(set(ids[row]) & set(approx)) for row, approx in zip(truth, found))
+    return hits / (len(queries) * k)
+
+
+def tune_for_recall(index, embeddings: np.ndarray, ids: np.ndarray, config: IndexConfig, k: int = 10) -> float:
+    """Raise nprobe / efSearch until recall@k reaches config.min_recall; returns the final recall
+
+    The tuned values are written back to `config`, so pass the config owned by this index.
+    """
+    base = faiss.downcast_index(index.index)
+    recall = recall_at_k(index, embeddings, ids, config, k)
+    while recall < config.min_recall:
+        if isinstance(base, faiss.IndexIVF) and config.nprobe < base.nlist:
+            config.nprobe = min(config.nprobe * 2, base.nlist)
+        elif isinstance(base, faiss.IndexHNSW) and config.ef_search < 1024:
+            config.ef_search *= 2
+        else:
+            break
+        apply_search_params(index, config)
+        recall = recall_at_k(index, embeddings, ids, config, k)
+    return recall
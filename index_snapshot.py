@@ -0,0 +1,73 @@
+import hashlib
+import json
+import os
+import tempfile
+from typing import Dict, List, Optional
+
+import faiss
+import numpy as np
+
+# Bump whenever the stored layout changes so old snapshots are rebuilt
+SNAPSHOT_FORMAT = 3
+
+
+def snapshot_key(menu_bytes: bytes, model_name: str, template: str) -> str:
+    """Hash everything the index depends on"""
+    digest = hashlib.sha256()
+    for part in (menu_bytes, model_name.encode('utf-8'), template.encode('utf-8')):
+        digest.update(hashlib.sha256(part).digest())
+    return digest.hexdigest()
+
+
+class IndexSnapshot:
+    """Single-file snapshot of embeddings, FAISS index and documents"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def load(self, key: str) -> Optional[Dict]:
+        """Load the snapshot if it was built for `key`, else return None"""
+        if not os.path.exists(self.path):
+            return None
+
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                if 'format' not in data.files or data['format'].item() != SNAPSHOT_FORMAT:
+                    return None
+                if data['key'].item() != key:
+                    return None
+                snapshot = {name: data[name] for name in data.files if name not in ('format', 'key', 'index', 'documents')}
+                snapshot['index'] = faiss.deserialize_index(data['index'])
+                snapshot['documents'] = json.loads(data['documents'].item())
+        except (OSError, ValueError, KeyError, RuntimeError) as e:
+            print(f"Ignoring unreadable index snapshot {self.path}: {e}")
+            return None
+
+        return snapshot
+
+    def save(self, key: str, index, documents: List[Dict], **arrays: np.ndarray):
+        """Write the snapshot to a temp file and atomically replace the old one
+
+        Extra keyword arrays (embeddings, doc ids, ...) are stored alongside the index.
+        """
+        directory = os.path.dirname(self.path) or '.'
+        os.makedirs(directory, exist_ok=True)
+
+        fd, tmp_path = tempfile.mkstemp(prefix='.snapshot-', suffix='.tmp', dir=directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(
+                    f,
+                    format=np.array(SNAPSHOT_FORMAT),
+                    key=np.array(key),
+                    index=faiss.serialize_index(index),
+                    documents=np.array(json.dumps(documents, ensure_ascii=False)),
+                    **arrays
+                )
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
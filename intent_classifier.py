@@ -0,0 +1,100 @@
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from text_utils import normalize_query
+
+# Labelled example utterances; each one is a prototype for its intent
+INTENT_EXAMPLES = {
+    'order': [
+        "tôi muốn đặt phở bò", "cho tôi một tô bún chả", "thêm 2 ly cà phê sữa đá",
+        "gọi cho mình một phần cơm tấm", "order một ly trà đá", "lấy thêm một bánh mì thịt",
+        "đặt món lẩu thái", "cho mình hai phần gỏi cuốn"
+    ],
+    'cancel': [
+        "hủy đơn hàng", "tôi muốn hủy đơn", "cancel order", "không đặt nữa, hủy giúp tôi",
+        "bỏ đơn hàng vừa đặt", "hủy đơn vừa xác nhận"
+    ],
+    'menu_info': [
+        "cho tôi xem menu", "thực đơn có những món gì", "nhà hàng có món gì",
+        "xem thực đơn", "có những món nào", "menu hôm nay"
+    ],
+    'price_info': [
+        "giá bún chả bao nhiêu", "phở bò bao nhiêu tiền", "món này giá thế nào",
+        "cà phê sữa đá giá bao nhiêu", "bảng giá các món"
+    ],
+    'view_cart': [
+        "xem giỏ hàng", "giỏ hàng của tôi có gì", "tôi đã đặt những món nào",
+        "kiểm tra đơn hàng hiện tại", "xem lại các món đã chọn"
+    ],
+    'confirm_order': [
+        "xác nhận đơn hàng", "tôi xác nhận", "chốt đơn", "confirm", "đồng ý đặt đơn này",
+        "ok xác nhận giúp tôi"
+    ],
+    'soup_dishes': [
+        "có món nào có nước không", "món nước có gì", "tôi muốn ăn món có nước",
+        "có canh không", "có món súp nào không", "gợi ý món nước"
+    ],
+    'general': [
+        "món nào ngon nhất", "nhà hàng mở cửa lúc mấy giờ", "có món chay không",
+        "món nào phù hợp cho trẻ em", "bạn gợi ý món gì cho bữa trưa", "món nào cay",
+        "xin chào", "cảm ơn bạn"
+    ]
+}
+
+
+class IntentClassifier:
+    """Nearest-prototype intent classifier over query embeddings
+
+    Prototype vectors are encoded once on first use. classify() takes the query
+    embedding already computed for retrieval, so routing costs a matrix product,
+    not another encoder pass. Low-confidence results return None so the caller
+    can fall back to keyword rules.
+    """
+
+    def __init__(self, encode: Callable[[List[str]], np.ndarray],
+                 examples: Optional[Dict[str, List[str]]] = None,
+                 threshold: float = 0.7, margin: float = 0.03):
+        self.encode = encode
+        self.examples = examples or INTENT_EXAMPLES
+        self.threshold = threshold
+        self.margin = margin
+        self._prototypes = None
+        self._labels = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _unit(vectors: np.ndarray) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype='float32')
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    def _ensure_prototypes(self):
+        if self._prototypes is not None:
+            return
+        with self._lock:
+            if self._prototypes is not None:
+                return
+            labels, texts = [], []
+            for intent, utterances in self.examples.items():
+                for utterance in utterances:
+                    labels.append(intent)
+                    texts.append(normalize_query(utterance))
+            self._labels = np.array(labels)
+            self._prototypes = self._unit(self.encode(texts))
+
+    def scores(self, query_vector: np.ndarray) -> Dict[str, float]:
+        """Best cosine similarity per intent"""
+        self._ensure_prototypes()
+        similarities = self._prototypes @ self._unit(query_vector).reshape(-1)
+        return {intent: float(similarities[self._labels == intent].max()) for intent in self.examples}
+
+    def classify(self, query_vector: np.ndarray) -> Tuple[Optional[str], float]:
+        """(intent, confidence); intent is None below the threshold or margin"""
+        ranked = sorted(self.scores(query_vector).items(), key=lambda kv: kv[1], reverse=True)
+        best_intent, best = ranked[0]
+        runner_up = ranked[1][1] if len(ranked) > 1 else -1.0
+        if best < self.threshold or best - runner_up < self.margin:
+            return None, best
+        return best_intent, best
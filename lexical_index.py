@@ -0,0 +1,114 @@
+import heapq
+import math
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from text_utils import fold_accents, tokenize
+
+# Function words that carry no dish information
+STOPWORDS = {
+    'tôi', 'cho', 'muốn', 'có', 'không', 'gì', 'món', 'nào', 'ạ', 'à', 'với',
+    'và', 'một', 'của', 'là', 'đặt', 'gọi', 'thêm', 'xem', 'bao', 'nhiêu', 'ly', 'phần'
+}
+STOPWORDS |= {fold_accents(word) for word in STOPWORDS}
+
+# Repeat field terms to weight them in term frequency
+FIELD_WEIGHTS = {'name': 3, 'category': 1, 'description': 1, 'ingredients': 2}
+
+FOLDED_PREFIX = '~'
+
+
+def index_terms(text: str) -> List[str]:
+    """Syllables and syllable bigrams, in both accented and accent-folded form"""
+    syllables = [t for t in tokenize(text) if t not in STOPWORDS]
+    folded = [fold_accents(t) for t in syllables]
+    terms = []
+    for words, prefix in ((syllables, ''), (folded, FOLDED_PREFIX)):
+        terms += [prefix + w for w in words]
+        terms += [f"{prefix}{a}_{b}" for a, b in zip(words, words[1:])]
+    return terms
+
+
+class LexicalIndex:
+    """BM25 inverted index over menu documents, keyed by doc id"""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings = defaultdict(dict)   # term -> {doc_id: tf}
+        self.doc_terms = {}                 # doc_id -> Counter, needed for removal
+        self.doc_lengths = {}
+        self.names = {}                     # doc_id -> folded dish name
+        self._total_length = 0
+
+    def __len__(self) -> int:
+        return len(self.doc_terms)
+
+    @staticmethod
+    def _fields(item: Dict) -> Dict[str, str]:
+        return {
+            'name': item['name'],
+            'category': item['category'],
+            'description': item['description'],
+            'ingredients': ' '.join(item['ingredients'])
+        }
+
+    def add(self, doc_id: int, item: Dict):
+        """Index a menu item, replacing any previous version of the doc"""
+        self.remove(doc_id)
+
+        counts = Counter()
+        for field, text in self._fields(item).items():
+            for _ in range(FIELD_WEIGHTS[field]):
+                counts.update(index_terms(text))
+
+        for term, tf in counts.items():
+            self.postings[term][doc_id] = tf
+        self.doc_terms[doc_id] = counts
+        self.doc_lengths[doc_id] = sum(counts.values())
+        self.names[doc_id] = ' '.join(tokenize(fold_accents(item['name'])))
+        self._total_length += self.doc_lengths[doc_id]
+
+    def remove(self, doc_id: int):
+        """Drop a doc from the index if present"""
+        counts = self.doc_terms.pop(doc_id, None)
+        if counts is None:
+            return
+        for term in counts:
+            postings = self.postings[term]
+            del postings[doc_id]
+            if not postings:
+                del self.postings[term]
+        del self.names[doc_id]
+        self._total_length -= self.doc_lengths.pop(doc_id)
+
+    def search(self, query: str, top_k: int = 3, allowed: Optional[Sequence[bool]] = None) -> List[Tuple[int, float]]:
+        """Rank docs by BM25 score; returns (doc_id, score) pairs
+
+        `allowed`, if given, is indexed by doc id and restricts the candidates.
+        """
+        n_docs = len(self.doc_terms)
+        if n_docs == 0:
+            return []
+        avg_length = self._total_length / n_docs
+
+        scores = defaultdict(float)
+        for term, qtf in Counter(index_terms(query)).items():
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, tf in postings.items():
+                if allowed is not None and not allowed[doc_id]:
+                    continue
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / avg_length)
+                scores[doc_id] += qtf * idf * tf * (self.k1 + 1) / (tf + norm)
+
+        return heapq.nlargest(top_k, scores.items(), key=lambda kv: kv[1])
+
+    def is_confident(self, query: str, hits: List[Tuple[int, float]]) -> bool:
+        """True when the best hit's full dish name appears in the query"""
+        if not hits:
+            return False
+        padded_query = f" {' '.join(tokenize(fold_accents(query)))} "
+        return f" {self.names[hits[0][0]]} " in padded_query
@@ -1,27 +1,189 @@
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import Future
 import torch
-from transformers import AutoTokenizer, AutoModelForCausalLM, BitsAndBytesConfig
-from typing import List, Dict
+from transformers import (AutoTokenizer, AutoModelForCausalLM, BitsAndBytesConfig,
+                          StoppingCriteria, StoppingCriteriaList)
+from transformers.generation.streamers import BaseStreamer
+from typing import Callable, List, Dict, Iterator, Optional, Sequence
+
+from generation_batcher import GenerationBatcher
+from prefix_cache import PrefixKVCache
+
+SYSTEM_MESSAGE = "Bạn là trợ lý nhà hàng. Trả lời ngắn gọn về món ăn, giá cả, đặt món."
+
+# The assistant turn ends at the ChatML end marker or when the model starts a new role turn
+STOP_SEQUENCES = ("<|im_end|>", "<|im_start|>", "\nuser\n", "\nassistant\n")
+
+FALLBACK_RESPONSE = "Xin lỗi, tôi chưa hiểu rõ yêu cầu của bạn."
+
+# Weight formats for machines without CUDA
+CPU_MODES = ('bf16', 'int8', 'fp32')
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident memory of this process so far, or None where it is not reported (Windows)"""
+    try:
+        import resource     # Unix only; imported here so the module still loads on Windows
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS, in kilobytes on Linux
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def quantize_int8_by_block(model):
+    """Dynamic int8 quantization of every nn.Linear, one transformer block at a time
+    
+    Each block is upcast to fp32 only while it is quantized, so peak memory
+    stays near the bf16 checkpoint instead of a full fp32 copy. The remaining
+    small modules (embeddings, norms) run in fp32, as dynamic int8 kernels expect.
+    """
+    for module in list(model.modules()):
+        if isinstance(module, torch.nn.ModuleList):
+            for block in module:
+                block.float()
+                torch.quantization.quantize_dynamic(block, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+    model.float()
+    torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+    return model
+
+
+class StopOnSequences(StoppingCriteria):
+    """Stop generating once every row has produced EOS or one of the stop strings"""
+    
+    def __init__(self, tokenizer, stops: Sequence[str], prompt_length: int, eos_token_ids: Sequence[int],
+                 lookback: int = 8):
+        self.tokenizer = tokenizer
+        self.stops = stops
+        self.eos_token_ids = set(eos_token_ids)
+        self.prompt_length = prompt_length
+        self.lookback = lookback
+        self.finished = set()
+    
+    def __call__(self, input_ids, scores, **kwargs) -> bool:
+        for row, tokens in enumerate(input_ids):
+            if row in self.finished:
+                continue
+            if tokens[-1].item() in self.eos_token_ids:
+                self.finished.add(row)
+                continue
+            # Only the last few tokens can complete a stop string
+            tail = self.tokenizer.decode(tokens[max(self.prompt_length, len(tokens) - self.lookback):])
+            if any(stop in tail for stop in self.stops):
+                self.finished.add(row)
+        return len(self.finished) == len(input_ids)
+
+
+class RowStreamer(BaseStreamer):
+    """Streams each row of a batched generate to its own callback
+    
+    Only the row's generated tokens are decoded. Text is released up to the
+    last word boundary, and never from a stop sequence on, so callers receive
+    exactly the text the batched path would return.
+    """
+    
+    def __init__(self, handler: 'LLMHandler', on_deltas: List[Optional[Callable[[str], None]]],
+                 max_lengths: List[int]):
+        self.handler = handler
+        self.on_deltas = on_deltas
+        self.max_lengths = max_lengths
+        self.tokens = [[] for _ in on_deltas]
+        self.emitted = [0] * len(on_deltas)
+        self.done = [on_delta is None for on_delta in on_deltas]
+        self.prompt_seen = False
+    
+    def put(self, value):
+        # generate() first passes the prompt ids, then one new token per row per step
+        if not self.prompt_seen:
+            self.prompt_seen = True
+            return
+        for row, token in enumerate(value.view(-1).tolist()):
+            if self.done[row]:
+                continue
+            if token in self.handler.eos_token_ids:
+                # Rows that finished early are padded until the whole batch stops
+                self._emit(row, final=True)
+                continue
+            self.tokens[row].append(token)
+            self._emit(row, final=len(self.tokens[row]) >= self.max_lengths[row])
+    
+    def end(self):
+        for row in range(len(self.tokens)):
+            if not self.done[row]:
+                self._emit(row, final=True)
+    
+    def _emit(self, row: int, final: bool):
+        text = self.handler.tokenizer.decode(self.tokens[row])
+        stop = self.handler._stop_index(text)
+        if stop is not None:
+            text, final = text[:stop], True
+        if final:
+            text = text.rstrip()
+            safe = len(text)
+        else:
+            # Words can still change as tokens arrive, and the tail may be starting a stop sequence
+            safe = min(max(text.rfind(' '), text.rfind('\n')) + 1,
+                       len(text) - self.handler._partial_stop_length(text))
+        if safe > self.emitted[row]:
+            self.on_deltas[row](text[self.emitted[row]:safe])
+            self.emitted[row] = safe
+        self.done[row] = final
+
 
 class LLMHandler:
-    def __init__(self, model_name: str = "vilm/vinallama-7b-chat"):
+    def __init__(self, model_name: str = "vilm/vinallama-7b-chat", max_batch_size: int = 4,
+                 batch_window_ms: float = 10.0, max_prefixes: int = 8, cpu_mode: str = 'bf16',
+                 num_threads: int = None):
+        if cpu_mode not in CPU_MODES:
+            raise ValueError(f"cpu_mode must be one of {CPU_MODES}, got {cpu_mode!r}")
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
-        print(f"Using device: {self.device}")
+        self.cpu_mode = cpu_mode if self.device == "cpu" else None
+        print(f"Using device: {self.device}" + (f" ({cpu_mode} weights)" if self.cpu_mode else ""))
+        # Process-wide intra-op thread count for CPU matmuls
+        if num_threads:
+            torch.set_num_threads(num_threads)
         
-        # Load only vinallama-7b-chat
-        model_to_load = "vilm/vinallama-7b-chat"
+        model_to_load = model_name
         
         self.model = None
         self.tokenizer = None
         
         try:
             print(f"Loading: {model_to_load}")
+            start = time.perf_counter()
             self.model, self.tokenizer = self._load_model(model_to_load)
+            self.load_seconds = time.perf_counter() - start
             self.current_model = model_to_load
             print(f"✓ Successfully loaded: {model_to_load}")
         except Exception as e:
             raise RuntimeError(f"Failed to load {model_to_load}: {str(e)}")
         
-        print("Model loaded successfully!")
+        peak = peak_rss_mb()
+        print(f"Model loaded successfully! ({self.load_seconds:.1f}s"
+              + (f", peak RSS {peak:,.0f} MB)" if peak is not None else ")"))
+        
+        # When the ChatML end marker is a single token, generate() can stop each row on it directly
+        self.eos_token_ids = [self.tokenizer.eos_token_id]
+        im_end_id = self.tokenizer.convert_tokens_to_ids("<|im_end|>")
+        if im_end_id is not None and im_end_id != self.tokenizer.unk_token_id:
+            self.eos_token_ids.append(im_end_id)
+        
+        # One generate at a time on the shared model, whichever path calls it
+        self._generate_lock = threading.Lock()
+        
+        # Concurrent callers share one batched generate; max_batch_size=1 generates one prompt at a time
+        self.batcher = None
+        if max_batch_size > 1:
+            self.batcher = GenerationBatcher(self._generate_batch, max_batch_size, batch_window_ms)
+        
+        # Every prompt starts with the same system block: prefill it once and reuse its key/values
+        self.prefix_cache = None
+        if max_prefixes > 0:
+            self.prefix_cache = PrefixKVCache(self.model, max_prefixes)
+            self.add_prefix(self.system_block())
     
     def _load_model(self, model_name: str):
         """Load model with appropriate configuration"""
@@ -38,6 +200,8 @@ class LLMHandler:
         # Set pad token if not exists
         if tokenizer.pad_token is None:
             tokenizer.pad_token = tokenizer.eos_token
+        # Batched prompts must end where generation starts
+        tokenizer.padding_side = "left"
         
         # Load model with quantization
         if self.device == "cuda":
@@ -49,67 +213,211 @@ class LLMHandler:
                 torch_dtype=torch.float16
             )
         else:
+            # Stream safetensors shards straight into bf16 (or fp32) weights instead of
+            # materializing a randomly initialized fp32 model first
             model = AutoModelForCausalLM.from_pretrained(
                 model_name,
-                device_map="auto",
-                trust_remote_code=True
+                low_cpu_mem_usage=True,
+                trust_remote_code=True,
+                torch_dtype=torch.float32 if self.cpu_mode == 'fp32' else torch.bfloat16
             )
+            if self.cpu_mode == 'int8':
+                quantize_int8_by_block(model)
+            model.eval()
         
         return model, tokenizer
     
     def generate_response(self, prompt: str, max_length: int = 200) -> str:
         """Generate response from LLM with proper cleaning"""
+        return self._submit(prompt, max_length).result()
+    
+    def _submit(self, prompt: str, max_length: int, on_delta: Callable[[str], None] = None) -> Future:
+        """Queue on the batcher, or generate on a helper thread when batching is off"""
+        if self.batcher is not None:
+            return self.batcher.submit(prompt, max_length, on_delta)
+        
+        future = Future()
+        
+        def run():
+            try:
+                future.set_result(self._generate_batch([prompt], [max_length], [on_delta])[0])
+            except BaseException as e:
+                future.set_exception(e)
+        
+        threading.Thread(target=run, name="llm-generate", daemon=True).start()
+        return future
+    
+    def _generate_batch(self, prompts: List[str], max_lengths: List[int],
+                        on_deltas: List[Optional[Callable[[str], None]]] = None) -> List[str]:
+        """Run one generate over left-padded prompts; each output is cut to its own token budget
+        
+        Rows with an on_delta callback also receive their text as it is generated.
+        """
         # Tokenize input
         inputs = self.tokenizer(
-            prompt,
+            prompts,
             return_tensors="pt",
+            padding=True,
             truncation=True,
             max_length=1024
         ).to(self.device)
         
         input_length = inputs['input_ids'].shape[1]
         
+        # Left padding shifts the prefix, so cached key/values only apply to single prompts
+        extra = self._cached_prefix(inputs) if len(prompts) == 1 else {}
+        
+        if on_deltas and any(on_deltas):
+            extra['streamer'] = RowStreamer(self, on_deltas, max_lengths)
+        
         # Generate
-        with torch.no_grad():
-            outputs = self.model.generate(
-                **inputs,
-                max_new_tokens=max_length,
-                do_sample=True,
-                temperature=0.7,
-                top_p=0.9,
-                repetition_penalty=1.2,
-                pad_token_id=self.tokenizer.pad_token_id,
-                eos_token_id=self.tokenizer.eos_token_id
-            )
+        with self._generate_lock, torch.inference_mode():
+            outputs = self.model.generate(**inputs, **extra, **self._generation_kwargs(max(max_lengths), input_length))
+        
+        # Decode only what each row generated, within its own budget
+        responses = []
+        for generated_tokens, max_length in zip(outputs, max_lengths):
+            response = self.tokenizer.decode(generated_tokens[input_length:input_length + max_length])
+            responses.append(self._clean_response(response))
+        return responses
+    
+    def _generation_kwargs(self, max_new_tokens: int, prompt_length: int) -> Dict:
+        """Sampling settings and stop criteria shared by the batched and streaming paths"""
+        return dict(
+            max_new_tokens=max_new_tokens,
+            stopping_criteria=StoppingCriteriaList([
+                StopOnSequences(self.tokenizer, STOP_SEQUENCES, prompt_length, self.eos_token_ids)
+            ]),
+            do_sample=True,
+            temperature=0.7,
+            top_p=0.9,
+            repetition_penalty=1.2,
+            pad_token_id=self.tokenizer.pad_token_id,
+            eos_token_id=self.eos_token_ids
+        )
+    
+    def stream_response(self, prompt: str, max_length: int = 200) -> Iterator[str]:
+        """Yield text deltas while the model generates
+        
+        Streamed prompts are batched with any other pending prompts; only
+        newly generated tokens are decoded, and text from a stop sequence on
+        is never yielded.
+        """
+        deltas = queue.Queue()
+        future = self._submit(prompt, max_length, deltas.put)
+        future.add_done_callback(lambda _: deltas.put(None))
+        for delta in iter(deltas.get, None):
+            yield delta
+        future.result()
+    
+    def add_prefix(self, text: str):
+        """Prefill a prompt prefix shared by many requests (system block, recurring menu context)"""
+        if self.prefix_cache is not None:
+            with self._generate_lock:
+                self.prefix_cache.add(self.tokenizer(text)['input_ids'])
+    
+    def _cached_prefix(self, inputs) -> Dict:
+        """generate() kwargs reusing the longest cached prefix of a single tokenized prompt"""
+        if self.prefix_cache is None:
+            return {}
+        past, _ = self.prefix_cache.match(inputs['input_ids'][0].tolist())
+        return {'past_key_values': past} if past is not None else {}
+    
+    def measure_prefill(self, prompt: str, repeats: int = 3) -> Dict:
+        """Prefill time and key/value memory for one prompt, with and without prefix reuse"""
+        input_ids = self.tokenizer(prompt, return_tensors="pt")['input_ids'].to(self.device)
+        past, cached = self.prefix_cache.match(input_ids[0].tolist()) if self.prefix_cache else (None, 0)
         
-        generated_tokens = outputs[0]
-        response = self.tokenizer.decode(generated_tokens, skip_special_tokens=True)
+        def prefill(ids, past_key_values=None) -> float:
+            best = float('inf')
+            for _ in range(repeats):
+                start = time.perf_counter()
+                with self._generate_lock, torch.inference_mode():
+                    self.model(input_ids=ids, past_key_values=past_key_values, use_cache=True)
+                if self.device == "cuda":
+                    torch.cuda.synchronize()
+                best = min(best, time.perf_counter() - start)
+            return best * 1000
         
-        print("Generated Response:", response)
+        with self._generate_lock, torch.inference_mode():
+            full_past = self.model(input_ids=input_ids, use_cache=True).past_key_values
+        if hasattr(full_past, 'to_legacy_cache'):
+            full_past = full_past.to_legacy_cache()
+        full_bytes = PrefixKVCache.kv_bytes(full_past)
+        bytes_per_token = full_bytes / input_ids.shape[1]
         
-        # Clean the response
-        return self._clean_response(response)
+        return {
+            'prompt_tokens': int(input_ids.shape[1]),
+            'cached_tokens': cached,
+            'prefill_ms_full': prefill(input_ids),
+            'prefill_ms_reused': prefill(input_ids[:, cached:], past) if past is not None else None,
+            # Key/values each request computes itself; the shared prefix is stored once
+            'kv_bytes_full': full_bytes,
+            'kv_bytes_reused': int(bytes_per_token * (input_ids.shape[1] - cached))
+        }
+    
+    def measure_throughput(self, prompt: str, max_new_tokens: int = 64) -> Dict:
+        """Load time, peak RSS and greedy decode speed, for sizing CPU-only nodes"""
+        inputs = self.tokenizer(prompt, return_tensors="pt").to(self.device)
+        start = time.perf_counter()
+        with self._generate_lock, torch.inference_mode():
+            outputs = self.model.generate(**inputs, max_new_tokens=max_new_tokens, min_new_tokens=max_new_tokens,
+                                          do_sample=False, pad_token_id=self.tokenizer.pad_token_id)
+        seconds = time.perf_counter() - start
+        new_tokens = outputs.shape[1] - inputs['input_ids'].shape[1]
+        return {
+            'device': self.device,
+            'cpu_mode': self.cpu_mode,
+            'threads': torch.get_num_threads(),
+            'load_seconds': self.load_seconds,
+            'peak_rss_mb': peak_rss_mb(),
+            'new_tokens': int(new_tokens),
+            'tokens_per_sec': new_tokens / seconds
+        }
+    
+    def prefix_stats(self) -> Dict:
+        """Prefix cache metrics, empty when reuse is off"""
+        return self.prefix_cache.stats() if self.prefix_cache is not None else {}
+    
+    def batch_stats(self) -> Dict:
+        """Batching metrics, empty when batching is off"""
+        return self.batcher.stats() if self.batcher is not None else {}
+    
+    def close(self):
+        """Stop the batching thread; it references the model, which stays loaded until this is called"""
+        if self.batcher is not None:
+            self.batcher.close()
+    
+    def _stops(self) -> Sequence[str]:
+        return STOP_SEQUENCES + ((self.tokenizer.eos_token,) if self.tokenizer.eos_token else ())
+    
+    def _stop_index(self, text: str) -> Optional[int]:
+        """Position of the earliest stop sequence (or EOS text) in text, else None"""
+        positions = [text.find(stop) for stop in self._stops()]
+        positions = [position for position in positions if position != -1]
+        return min(positions) if positions else None
+    
+    def _partial_stop_length(self, text: str) -> int:
+        """Length of the longest suffix of text that begins a stop sequence"""
+        longest = 0
+        for stop in self._stops():
+            for length in range(min(len(stop) - 1, len(text)), longest, -1):
+                if text.endswith(stop[:length]):
+                    longest = length
+                    break
+        return longest
     
     def _clean_response(self, response: str) -> str:
-        """Clean the generated response"""
-        response = response.strip()
-        # just take the last assistant response
-        response_parts = response.rfind("assistant")
-        print("Response parts index:", response_parts)
-        if response_parts != -1:
-            response = response[response_parts + len("assistant"):].strip()
-        else:
-            response = "Xin lỗi, tôi chưa hiểu rõ yêu cầu của bạn."
-        
-        return response.strip()
+        """Cut generated text at the first stop sequence"""
+        stop = self._stop_index(response)
+        if stop is not None:
+            response = response[:stop]
+        return response.strip() or FALLBACK_RESPONSE
 
     def create_prompt(self, context: str, query: str, chat_history: List[Dict]) -> str:
         """Create simplified prompt - system context in one block"""
-        # Combine system prompt and context into one message
-        system_message = "Bạn là trợ lý nhà hàng. Trả lời ngắn gọn về món ăn, giá cả, đặt món."
-        
-        # Build prompt
-        prompt = f"<|im_start|> system\n{system_message}<|im_end|>\n"
+        # Build prompt; the system block is the cached prefix
+        prompt = self.system_block()
         
         # Add only the last turn of history (if exists)
         if chat_history and len(chat_history) > 0:
@@ -123,12 +431,18 @@ class LLMHandler:
         
         return prompt
     
+    @staticmethod
+    def system_block() -> str:
+        """Fixed system message that opens every prompt"""
+        return f"<|im_start|> system\n{SYSTEM_MESSAGE}<|im_end|>\n"
+    
     def get_welcome_message(self) -> str:
         """Return default welcome message without LLM generation"""
         # Always use default message for consistency and speed
         return self._default_welcome()
     
-    def _default_welcome(self) -> str:
+    @staticmethod
+    def _default_welcome() -> str:
         """Default welcome message"""
         return """Xin chào! Tôi là trợ lý ảo của nhà hàng. 🍜
 
@@ -0,0 +1,124 @@
+import sys
+from collections.abc import Mapping
+from typing import Dict, Iterable, List, Optional
+
+from dish_extractor import DishExtractor, DishMention
+from text_utils import normalize_query
+
+# Name keywords for dishes served with broth
+SOUP_KEYWORDS = ('phở', 'bún', 'hủ tiếu', 'canh', 'lẩu', 'súp', 'miến', 'bánh canh')
+
+
+class MenuItem(Mapping):
+    """Compact, read-only menu record
+
+    Behaves like the original item dict (item['name'], dict(item), ==) but
+    stores its fields in slots, with category strings interned.
+    """
+
+    __slots__ = ('id', 'name', 'category', 'price', 'description', 'ingredients', 'available')
+
+    def __init__(self, id: str, name: str, category: str, price: int, description: str,
+                 ingredients: Iterable[str], available: bool):
+        self.id = id
+        self.name = name
+        self.category = sys.intern(category)
+        self.price = price
+        self.description = description
+        self.ingredients = tuple(ingredients)
+        self.available = available
+
+    @classmethod
+    def from_dict(cls, data: Mapping) -> 'MenuItem':
+        """Build from a menu.json record"""
+        if isinstance(data, cls):
+            return data
+        return cls(**{field: data[field] for field in cls.__slots__})
+
+    def to_dict(self) -> Dict:
+        """Plain dict, e.g. for JSON serialization"""
+        data = {field: getattr(self, field) for field in self.__slots__}
+        data['ingredients'] = list(self.ingredients)
+        return data
+
+    def __getitem__(self, key: str):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        value = getattr(self, key)
+        return list(value) if key == 'ingredients' else value
+
+    def __iter__(self):
+        return iter(self.__slots__)
+
+    def __len__(self) -> int:
+        return len(self.__slots__)
+
+    def __hash__(self):
+        return hash(self.id)
+
+    def __repr__(self) -> str:
+        return f"MenuItem({self.id!r}, {self.name!r}, {self.price})"
+
+
+class MenuCatalog:
+    """Indexed view of one menu version, built once and shared by all sessions
+
+    `source` names the menu the catalog was built from (its file path), so
+    caches can tell successive versions of one restaurant's menu apart from
+    other restaurants' menus.
+    """
+
+    def __init__(self, items: Iterable[MenuItem], version: Optional[str] = None, source: Optional[str] = None):
+        self.version = version
+        self.source = source
+        self.items = tuple(items)
+        self.by_id = {item.id: item for item in self.items}
+
+        self.by_name = {}
+        self.by_category = {}
+        for item in self.items:
+            self.by_name.setdefault(normalize_query(item.name), item)
+            self.by_category.setdefault(item.category, []).append(item)
+        self.by_category = {category: tuple(group) for category, group in self.by_category.items()}
+
+        self.available_items = tuple(item for item in self.items if item.available)
+        self.soup_items = tuple(
+            item for item in self.items
+            if any(keyword in item.name.lower() for keyword in SOUP_KEYWORDS)
+        )
+        # (lowercase name, item) pairs for substring fallback in find_by_name
+        self.lowercase_names = tuple((item.name.lower(), item) for item in self.items)
+        self._extractor = None
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def get(self, item_id: str) -> Optional[MenuItem]:
+        """O(1) lookup by id"""
+        return self.by_id.get(item_id)
+
+    def find_by_name(self, name: str) -> Optional[MenuItem]:
+        """Exact (normalized) name match, else the first item whose name contains `name`"""
+        key = normalize_query(name)
+        item = self.by_name.get(key)
+        if item is not None:
+            return item
+        for name_lower, item in self.lowercase_names:
+            if key in name_lower:
+                return item
+        return None
+
+    @property
+    def extractor(self) -> DishExtractor:
+        """Dish-name automaton for this menu version, compiled on first use"""
+        if self._extractor is None:
+            self._extractor = DishExtractor(self.items)
+        return self._extractor
+
+    def extract_mentions(self, text: str) -> List[DishMention]:
+        """Dish mentions with quantities, in order of appearance"""
+        return self.extractor.extract(text)
+
+    def mentioned_in(self, text: str) -> List[MenuItem]:
+        """Items named in the text"""
+        return [mention.item for mention in self.extract_mentions(text)]
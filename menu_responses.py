@@ -0,0 +1,122 @@
+import math
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from menu_catalog import MenuCatalog
+
+# Listing limits of the menu and soup views
+MENU_CATEGORIES = 3
+MENU_ITEMS_PER_CATEGORY = 5
+SOUP_ITEMS = 8
+
+STRINGS = {
+    'vi': {
+        'menu_title': "📋 THỰC ĐƠN NHÀ HÀNG\n\n",
+        'menu_footer': "Bạn muốn biết thêm về món nào hoặc muốn đặt món không ạ?",
+        'soup_title': "🍜 Các món có nước trong menu:\n\n",
+        'soup_empty': "Xin lỗi, hiện tại chúng tôi không có món nước nào.",
+        'order_prompt': "Bạn muốn đặt món nào ạ?",
+        'page': "trang {page}/{pages}",
+        'next_page': "Gõ \"{category} trang {page}\" để xem tiếp.\n",
+        'currency': "đ"
+    },
+    'en': {
+        'menu_title': "📋 RESTAURANT MENU\n\n",
+        'menu_footer': "Would you like to know more about a dish or place an order?",
+        'soup_title': "🍜 Dishes served with broth:\n\n",
+        'soup_empty': "Sorry, we have no broth dishes right now.",
+        'order_prompt': "Which dish would you like to order?",
+        'page': "page {page}/{pages}",
+        'next_page': "Type \"{category} page {page}\" for more.\n",
+        'currency': " VND"
+    }
+}
+
+
+class MenuResponseCache:
+    """Pre-rendered menu, soup and per-category listings of each restaurant's menu
+
+    warm() renders every view of a catalog up front, so serving these intents
+    is a dictionary lookup. Each menu (catalog source) keeps only the render of
+    its latest version, so a menu edit replaces the old entry instead of
+    pushing out other restaurants. At most `max_menus` menus are kept, least
+    recently used dropped first.
+    """
+
+    def __init__(self, locales=('vi',), page_size: int = 8, max_menus: int = 256):
+        self.locales = tuple(locales)
+        self.page_size = page_size
+        self.max_menus = max_menus
+        self._entries = OrderedDict()   # (source, locale) -> (version, {view key: text})
+        self._lock = threading.Lock()
+
+    def warm(self, catalog: MenuCatalog):
+        """Render all views of a catalog for every configured locale"""
+        for locale in self.locales:
+            self._render(catalog, locale)
+
+    def _render(self, catalog: MenuCatalog, locale: str) -> Dict[str, str]:
+        strings = STRINGS[locale]
+        views = {'menu': self._menu(catalog, strings), 'soup': self._soup(catalog, strings)}
+        for category, items in catalog.by_category.items():
+            pages = max(1, math.ceil(len(items) / self.page_size))
+            for page in range(1, pages + 1):
+                views[self.category_key(category, page)] = self._category_page(
+                    category, items, page, pages, strings)
+
+        key = (catalog.source, locale)
+        with self._lock:
+            self._entries[key] = (catalog.version, views)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_menus * len(self.locales):
+                self._entries.popitem(last=False)
+        return views
+
+    def get(self, catalog: MenuCatalog, view: str, locale: str = 'vi') -> Optional[str]:
+        """Rendered text of a view; renders the catalog first if it was never warmed"""
+        if locale not in STRINGS:
+            locale = 'vi'
+        key = (catalog.source, locale)
+        with self._lock:
+            version, views = self._entries.get(key, (None, None))
+            if views is not None:
+                self._entries.move_to_end(key)
+        if views is None or version != catalog.version:
+            views = self._render(catalog, locale)
+        return views.get(view)
+
+    @staticmethod
+    def category_key(category: str, page: int) -> str:
+        return f"category:{category}:{page}"
+
+    @staticmethod
+    def _price(item, strings: Dict[str, str]) -> str:
+        return f"{item['price']:>8,}{strings['currency']}"
+
+    def _menu(self, catalog: MenuCatalog, strings: Dict[str, str]) -> str:
+        response = strings['menu_title']
+        for category, items in list(catalog.by_category.items())[:MENU_CATEGORIES]:
+            response += f"▸ {category.upper()}\n"
+            for item in items[:MENU_ITEMS_PER_CATEGORY]:
+                response += f"  • {item['name']:<22} {self._price(item, strings)}\n"
+            response += "\n"
+        return response + strings['menu_footer']
+
+    def _soup(self, catalog: MenuCatalog, strings: Dict[str, str]) -> str:
+        if not catalog.soup_items:
+            return strings['soup_empty']
+        response = strings['soup_title']
+        for item in catalog.soup_items[:SOUP_ITEMS]:
+            response += f"• {item['name']:<25} {self._price(item, strings)}\n  {item['description']}\n\n"
+        return response + strings['order_prompt']
+
+    def _category_page(self, category: str, items, page: int, pages: int, strings: Dict[str, str]) -> str:
+        start = (page - 1) * self.page_size
+        response = f"▸ {category.upper()} ({strings['page'].format(page=page, pages=pages)})\n"
+        for item in items[start:start + self.page_size]:
+            response += f"  • {item['name']:<22} {self._price(item, strings)}\n"
+        response += "\n"
+        if page < pages:
+            response += strings['next_page'].format(category=category.lower(), page=page + 1)
+        return response + strings['order_prompt']
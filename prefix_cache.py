@@ -0,0 +1,80 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import torch
+
+
+class PrefixKVCache:
+    """Past key/values of shared prompt prefixes, keyed by their token ids
+
+    add() prefills a prefix once; match() finds the longest cached prefix of a
+    tokenized prompt so generate() only prefills the remainder. Generation
+    extends a copy of the cache, so stored tensors are never modified. Holds at
+    most `max_entries` prefixes, least recently used dropped first.
+    """
+
+    def __init__(self, model, max_entries: int = 8):
+        self.model = model
+        self.max_entries = max_entries
+        self._entries = OrderedDict()   # tuple of token ids -> past key/values
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.reused_tokens = 0
+
+    def add(self, prefix_ids: List[int]):
+        """Prefill a prefix and keep its key/values"""
+        key = tuple(prefix_ids)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return
+        input_ids = torch.tensor([prefix_ids], device=self.model.device)
+        with torch.inference_mode():
+            past = self.model(input_ids=input_ids, use_cache=True).past_key_values
+        if hasattr(past, 'to_legacy_cache'):
+            past = past.to_legacy_cache()
+
+        with self._lock:
+            self._entries[key] = past
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def match(self, input_ids: List[int]) -> Tuple[Optional[tuple], int]:
+        """(past key/values, prefix length) of the longest cached prefix, or (None, 0)
+
+        At least one prompt token is left uncached so the model has something to prefill.
+        """
+        n_tokens = len(input_ids)
+        with self._lock:
+            best = None
+            for key in self._entries:
+                if len(key) < n_tokens and (best is None or len(key) > len(best)) \
+                        and tuple(input_ids[:len(key)]) == key:
+                    best = key
+            if best is None:
+                self.misses += 1
+                return None, 0
+            self._entries.move_to_end(best)
+            self.hits += 1
+            self.reused_tokens += len(best)
+            return self._entries[best], len(best)
+
+    @staticmethod
+    def kv_bytes(past) -> int:
+        """Memory held by a set of past key/values"""
+        return sum(tensor.numel() * tensor.element_size() for layer in past for tensor in layer)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'prefixes': len(self._entries),
+                'prefix_tokens': [len(key) for key in self._entries],
+                'kv_bytes': sum(self.kv_bytes(past) for past in self._entries.values()),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'reused_tokens': self.reused_tokens
+            }
@@ -0,0 +1,140 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+from embedding_backend import EmbeddingBackend
+from embedding_cache import QueryEmbeddingCache
+from menu_catalog import MenuCatalog
+from rag_system import RAGSystem, EMBEDDING_MODEL_NAME
+
+DEFAULT_RESTAURANT = 'default'
+
+
+class RAGRegistry:
+    """One embedding model shared by many restaurants' RAG indexes
+
+    Tenants are built (or loaded from their snapshot) on first use. When the
+    loaded indexes exceed `memory_budget` bytes, the least recently used
+    tenants are evicted; they reload from their menu file's snapshot next
+    time. Tenants with live upsert/remove edits are never evicted, since
+    those edits exist only in memory; they become evictable again once
+    reload_menu() brings them back in line with their file. With
+    lazy=True a tenant only loads its menu up front; the model and index load
+    on its first search or ensure_ready().
+    """
+
+    def __init__(self, default_menu_path: str = "data/menu.json", menu_dir: Optional[str] = None,
+                 memory_budget: int = 512 * 1024 * 1024, query_cache_size: int = 4096,
+                 embedding_backend: str = 'default', embedding_threads: Optional[int] = None,
+                 lazy: bool = False, **rag_kwargs):
+        self.menu_paths = {DEFAULT_RESTAURANT: default_menu_path}
+        self.menu_dir = menu_dir
+        self.memory_budget = memory_budget
+        self.rag_kwargs = rag_kwargs
+        self.lazy = lazy
+
+        self.embedding_backend = embedding_backend
+        self.embedding_threads = embedding_threads
+        self._embedding_model = None
+        self._model_lock = threading.Lock()     # separate from _lock so tenant lookups never wait on the load
+        self.query_cache = QueryEmbeddingCache(max_size=query_cache_size)
+        self._loaded = OrderedDict()    # restaurant_id -> RAGSystem, LRU order
+        self._lock = threading.Lock()
+        self._tenant_locks = {}
+        self._catalog_listeners = []
+        self.evictions = 0
+
+    @property
+    def embedding_model(self) -> EmbeddingBackend:
+        """The shared model, loaded on first use"""
+        if self._embedding_model is None:
+            with self._model_lock:
+                if self._embedding_model is None:
+                    print("Loading embedding model...")
+                    self._embedding_model = EmbeddingBackend(EMBEDDING_MODEL_NAME, self.embedding_backend,
+                                                             self.embedding_threads)
+        return self._embedding_model
+
+    def register(self, restaurant_id: str, menu_path: str):
+        """Map a restaurant id to its menu file"""
+        with self._lock:
+            self.menu_paths[restaurant_id] = menu_path
+
+    def add_catalog_listener(self, listener: Callable[[MenuCatalog], None]):
+        """Call `listener` with every tenant's catalog now and whenever it changes"""
+        with self._lock:
+            self._catalog_listeners.append(listener)
+            loaded = list(self._loaded.values())
+        for rag in loaded:
+            rag.catalog_listeners.append(listener)
+            listener(rag.catalog)
+
+    def menu_path(self, restaurant_id: str) -> str:
+        """Registered menu path, else <menu_dir>/<restaurant_id>.json"""
+        path = self.menu_paths.get(restaurant_id)
+        if path is None and self.menu_dir is not None:
+            candidate = os.path.join(self.menu_dir, f"{restaurant_id}.json")
+            if os.path.exists(candidate):
+                path = candidate
+        if path is None:
+            raise KeyError(f"Unknown restaurant: {restaurant_id}")
+        return path
+
+    def get(self, restaurant_id: Optional[str] = None) -> RAGSystem:
+        """Return the tenant's RAGSystem, building or loading it if needed"""
+        restaurant_id = restaurant_id or DEFAULT_RESTAURANT
+        with self._lock:
+            rag = self._loaded.get(restaurant_id)
+            if rag is not None:
+                self._loaded.move_to_end(restaurant_id)
+                return rag
+            tenant_lock = self._tenant_locks.setdefault(restaurant_id, threading.Lock())
+
+        # Build outside the registry lock so other tenants keep serving
+        with tenant_lock:
+            with self._lock:
+                rag = self._loaded.get(restaurant_id)
+            if rag is None:
+                rag = RAGSystem(self.menu_path(restaurant_id), query_cache=self.query_cache,
+                                embedding_backend=self.embedding_backend, lazy=self.lazy,
+                                embedding_model_loader=lambda: self.embedding_model,
+                                catalog_listeners=list(self._catalog_listeners),
+                                on_ready=lambda: self.enforce_budget(restaurant_id), **self.rag_kwargs)
+                with self._lock:
+                    self._loaded[restaurant_id] = rag
+                    self._evict(keep=restaurant_id)
+        return rag
+
+    def _memory_bytes(self) -> int:
+        """Estimated size of all loaded tenants (caller holds the lock)"""
+        return sum(rag.memory_bytes() for rag in self._loaded.values())
+
+    def _evict(self, keep: str):
+        """Drop least recently used tenants until within budget (caller holds the lock)"""
+        while self._memory_bytes() > self.memory_budget:
+            # Reloading a tenant with in-memory edits would silently revert them
+            restaurant_id = next((rid for rid, rag in self._loaded.items()
+                                  if rid != keep and not rag.has_local_edits), None)
+            if restaurant_id is None:
+                break
+            del self._loaded[restaurant_id]
+            self.evictions += 1
+            print(f"Evicted RAG index for restaurant {restaurant_id}")
+
+    def enforce_budget(self, restaurant_id: str):
+        """Re-check the memory budget, e.g. after a tenant finished loading or was edited"""
+        with self._lock:
+            if restaurant_id in self._loaded:
+                self._evict(keep=restaurant_id)
+
+    def stats(self) -> Dict:
+        """Loaded tenants, memory use and evictions"""
+        with self._lock:
+            return {
+                'loaded': list(self._loaded),
+                'memory_bytes': self._memory_bytes(),
+                'memory_budget': self.memory_budget,
+                'evictions': self.evictions,
+                'query_cache': self.query_cache.stats()
+            }
@@ -1,81 +1,657 @@
+import copy
 import json
+import math
+import os
+import threading
+from contextlib import contextmanager
 import torch
-from typing import List, Dict
+from typing import List, Dict, Optional, Iterable, Union, Callable
 from sentence_transformers import SentenceTransformer
 import faiss
 import numpy as np
+from index_snapshot import IndexSnapshot, snapshot_key
+from embedding_cache import QueryEmbeddingCache
+from text_utils import normalize_query
+from lexical_index import LexicalIndex
+from search_filters import AttributeIndex
+from menu_catalog import MenuCatalog, MenuItem
+from embedding_backend import EmbeddingBackend, backend_cache_name, compare_backends
+from embedding_compression import EmbeddingCodec, compression_report
+from index_factory import IndexConfig, create_index, apply_search_params, search_params, supports_remove, tune_for_recall
+
+EMBEDDING_MODEL_NAME = 'dangvantuan/vietnamese-embedding'
+
+# Text embedded for each menu item; part of the snapshot key
+DOC_TEMPLATE = "{name} - {category}: {description}. Giá: {price:,}đ. Thành phần: {ingredients}."
+
+SEARCH_MODES = ('vector', 'lexical', 'hybrid')
+
+
+class _ReadWriteLock:
+    """Many concurrent readers or one writer; waiting writers block new readers"""
+    
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writing = False
+        self._writers_waiting = 0
+    
+    @contextmanager
+    def read(self):
+        with self._cond:
+            while self._writing or self._writers_waiting:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+    
+    @contextmanager
+    def write(self):
+        with self._cond:
+            self._writers_waiting += 1
+            while self._writing or self._readers:
+                self._cond.wait()
+            self._writers_waiting -= 1
+            self._writing = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writing = False
+                self._cond.notify_all()
+
 
 class RAGSystem:
-    def __init__(self, menu_path: str = "data/menu.json"):
+    def __init__(self, menu_path: str = "data/menu.json", cache_dir: Optional[str] = None, use_cache: bool = True,
+                 query_cache_size: int = 1024, query_cache_ttl: Optional[float] = None,
+                 search_mode: str = 'hybrid', lexical_fast_path: bool = True,
+                 fusion_depth: int = 20, rrf_k: int = 60, brute_force_threshold: int = 2048,
+                 index_config: Optional[IndexConfig] = None, embedding_model: Optional[SentenceTransformer] = None,
+                 query_cache: Optional[QueryEmbeddingCache] = None, embedding_backend: str = 'default',
+                 embedding_threads: Optional[int] = None, lazy: bool = False,
+                 embedding_model_loader: Optional[Callable[[], SentenceTransformer]] = None,
+                 catalog_listeners: Optional[List[Callable[[MenuCatalog], None]]] = None,
+                 on_ready: Optional[Callable[[], None]] = None):
+        if search_mode not in SEARCH_MODES:
+            raise ValueError(f"search_mode must be one of {SEARCH_MODES}, got {search_mode!r}")
         self.menu_path = menu_path
+        # Quantized backends produce different vectors, so they get their own snapshot key
+        if embedding_model is not None:
+            self.model_name = getattr(embedding_model, 'cache_name', EMBEDDING_MODEL_NAME)
+        else:
+            self.model_name = backend_cache_name(EMBEDDING_MODEL_NAME, embedding_backend)
+        self.menu_version = None
+        self.file_version = None     # version of the menu file; differs from menu_version after edits
         self.menu_items = self.load_menu()
         
-        # Use lightweight embedding model
-        print("Loading embedding model...")
-        self.embedding_model = SentenceTransformer('dangvantuan/vietnamese-embedding')
+        # Snapshot lives next to the menu unless told otherwise
+        if cache_dir is None:
+            cache_dir = os.path.join(os.path.dirname(menu_path), ".index_cache")
+        snapshot_name = os.path.splitext(os.path.basename(menu_path))[0] + ".snapshot.npz"
+        self.snapshot = IndexSnapshot(os.path.join(cache_dir, snapshot_name)) if use_cache else None
+        
+        # Use lightweight embedding model (may be shared between tenants); loaded in ensure_ready
+        self.embedding_model = embedding_model
+        self._embedding_model_loader = embedding_model_loader or (
+            lambda: EmbeddingBackend(EMBEDDING_MODEL_NAME, embedding_backend, embedding_threads)
+        )
         
+        # Query vectors depend only on the model, so they survive menu edits
+        self.query_cache = query_cache or QueryEmbeddingCache(max_size=query_cache_size, ttl=query_cache_ttl)
+        
+        # FAISS ids are our own doc ids, so single items can be replaced in place. Recall tuning
+        # adjusts nprobe/efSearch for this index only, so a config shared between tenants is copied
+        self.index_config = copy.copy(index_config) if index_config is not None else IndexConfig()
+        self.index_type = None       # resolved type when index_config says 'auto'
+        self.index_recall = None
         self.index = None
-        self.documents = []
-        self.build_index()
+        self.codec = EmbeddingCodec(self.index_config.compression, self.index_config.pca_dim,
+                                    normalize=self.index_config.metric == 'cosine')
+        self.documents = {}          # doc_id -> {'text', 'item'}
+        self.embeddings = None       # HNSW only: stored (possibly compressed) rows aligned with self.doc_ids
+        self.doc_ids = None
+        self._rows = {}              # doc_id -> row in self.embeddings
+        self._doc_of_item = {}       # item id -> doc_id
+        self._next_doc_id = 0
+        
+        # The catalog only needs the menu, so rule-based lookups work before the index is ready
+        # Listeners see every new catalog version (e.g. to pre-render menu responses)
+        self.catalog_listeners = list(catalog_listeners or ())
+        self._set_catalog(MenuCatalog(self.menu_items, self.menu_version, self.menu_path))
+        
+        # BM25 over the same documents, fused with FAISS by reciprocal rank
+        self.lexical = LexicalIndex()
+        self.search_mode = search_mode
+        self.lexical_fast_path = lexical_fast_path
+        self.fusion_depth = fusion_depth
+        self.rrf_k = rrf_k
+        
+        # Filters that keep at most this many docs are scored directly instead of via FAISS
+        self.attributes = None
+        self.brute_force_threshold = brute_force_threshold
+        
+        self._ready = threading.Event()
+        self._ready_lock = threading.Lock()
+        self._on_ready = on_ready
+        # Searches share the index state; menu edits get it exclusively
+        self._state_lock = _ReadWriteLock()
+        if not lazy:
+            self.ensure_ready()
+    
+    @property
+    def is_ready(self) -> bool:
+        """True once the embedding model and index are loaded"""
+        return self._ready.is_set()
+    
+    @property
+    def has_local_edits(self) -> bool:
+        """True when upsert/remove changed the menu since it was read from its file
+        
+        Such edits live only in memory: a reload from the file or its snapshot would undo them.
+        """
+        return self.menu_version != self.file_version
+    
+    def ensure_ready(self):
+        """Load the embedding model and build/load the index, once"""
+        if self._ready.is_set():
+            return
+        with self._ready_lock:
+            if self._ready.is_set():
+                return
+            if self.embedding_model is None:
+                print("Loading embedding model...")
+                self.embedding_model = self._embedding_model_loader()
+            self.build_index()
+            self._ready.set()
+        # Lazy tenants only have a real size now, e.g. for the registry's memory budget
+        if self._on_ready is not None:
+            self._on_ready()
+    
+    def _read_menu_file(self):
+        """Read the menu file, returning (items, version)"""
+        with open(self.menu_path, 'rb') as f:
+            raw = f.read()
+        return json.loads(raw.decode('utf-8')), snapshot_key(raw, self.model_name, DOC_TEMPLATE)
     
     def load_menu(self) -> List[Dict]:
         """Load menu from JSON file"""
-        with open(self.menu_path, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        items, self.menu_version = self._read_menu_file()
+        self.file_version = self.menu_version
+        return [MenuItem.from_dict(item) for item in items]
+    
+    @staticmethod
+    def format_document(item: Dict) -> str:
+        """Render the text that gets embedded for a menu item"""
+        return DOC_TEMPLATE.format(
+            name=item['name'],
+            category=item['category'],
+            description=item['description'],
+            price=item['price'],
+            ingredients=', '.join(item['ingredients'])
+        )
+    
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        """Embed texts as a float32 matrix"""
+        embeddings = self.embedding_model.encode(texts, convert_to_numpy=True)
+        return self._normalize(np.ascontiguousarray(embeddings, dtype='float32'))
+    
+    def embed_texts(self, texts: List[str]) -> np.ndarray:
+        """Embed arbitrary texts with this system's model"""
+        self.ensure_ready()
+        return self._encode(texts)
+    
+    def embed_query(self, query: str) -> np.ndarray:
+        """Query vector, through the same cache search() uses"""
+        self.ensure_ready()
+        return self._encode_queries([query])[0]
+    
+    def _normalize(self, vectors: np.ndarray) -> np.ndarray:
+        """L2-normalize in place when the index uses cosine similarity"""
+        if self.index_config.metric == 'cosine':
+            faiss.normalize_L2(vectors)
+        return vectors
+    
+    def _encode_queries(self, queries: List[str]) -> np.ndarray:
+        """Embed queries as one matrix, encoding every cache miss in a single batch"""
+        vectors = [self.query_cache.get(query) for query in queries]
+        
+        # Encode the normalized text so every variant of a query maps to the same vector
+        missing = {normalize_query(q) for q, v in zip(queries, vectors) if v is None}
+        if missing:
+            missing = list(missing)
+            fresh = dict(zip(missing, self._encode(missing)))
+            for text, vector in fresh.items():
+                self.query_cache.put(text, vector)
+            vectors = [v if v is not None else fresh[normalize_query(q)] for q, v in zip(queries, vectors)]
+        
+        return np.ascontiguousarray(np.vstack(vectors), dtype='float32')
+    
+    def _snapshot_key(self) -> str:
+        """Snapshots depend on the menu version and on how the index is built"""
+        return snapshot_key(self.menu_version.encode('utf-8'), self.model_name, self.index_config.fingerprint())
+    
+    def _build_vector_index(self, vectors: Optional[np.ndarray] = None):
+        """(Re)build the FAISS index from index-space vectors (default: decoded self.embeddings)"""
+        if vectors is None:
+            vectors = self.codec.decode(self.embeddings)
+        self.index, self.index_type = create_index(self.index_config, vectors, self.doc_ids)
+        if self.index_type != 'flat':
+            self.index_recall = tune_for_recall(self.index, vectors, self.doc_ids, self.index_config)
+            print(f"{self.index_type} index recall@10 vs flat: {self.index_recall:.3f}")
+        if not self._keeps_vectors:
+            self.embeddings = None
+    
+    @property
+    def _keeps_vectors(self) -> bool:
+        """Only HNSW keeps a copy of the vectors: it cannot drop items, so edits rebuild it
+        
+        Every other index type edits in place and reconstructs vectors by id.
+        """
+        return not supports_remove(self.index_type)
+    
+    def _stored_vectors(self, doc_ids: np.ndarray) -> np.ndarray:
+        """Index-space vectors of some docs"""
+        if self.embeddings is not None:
+            rows = np.fromiter((self._rows[int(d)] for d in doc_ids), dtype='int64', count=len(doc_ids))
+            return self.codec.decode(self.embeddings[rows])
+        return self.index.reconstruct_batch(np.ascontiguousarray(doc_ids, dtype='int64'))
+    
+    def _reset_lookups(self):
+        """Recompute the derived doc-id lookups"""
+        self._rows = {int(doc_id): row for row, doc_id in enumerate(self.doc_ids)}
+        self._doc_of_item = {doc['item']['id']: doc_id for doc_id, doc in self.documents.items()}
+        self._next_doc_id = int(self.doc_ids.max()) + 1 if len(self.doc_ids) else 0
+        self.menu_items = [doc['item'] for doc in self.documents.values()]
+        self.attributes = AttributeIndex(self.documents, self._next_doc_id)
+        self._set_catalog(MenuCatalog(self.menu_items, self.menu_version, self.menu_path))
+    
+    def _set_catalog(self, catalog: MenuCatalog):
+        """Publish a new catalog and notify listeners"""
+        self.catalog = catalog
+        for listener in self.catalog_listeners:
+            listener(catalog)
+    
+    def _build_lexical(self):
+        """Rebuild the BM25 index from the current documents"""
+        self.lexical = LexicalIndex(self.lexical.k1, self.lexical.b)
+        for doc_id, doc in self.documents.items():
+            self.lexical.add(doc_id, doc['item'])
     
     def build_index(self):
-        """Build FAISS index from menu items"""
+        """Build FAISS index from menu items, reusing the on-disk snapshot when valid"""
+        if self.snapshot is not None:
+            cached = self.snapshot.load(self._snapshot_key())
+            if cached is not None:
+                self.index = cached['index']
+                self.index_type = cached['index_type'].item()
+                self.codec.load_state(cached)
+                # Search parameters tuned when the snapshot was built
+                self.index_config.nprobe = int(cached['nprobe'])
+                self.index_config.ef_search = int(cached['ef_search'])
+                recall = float(cached['index_recall'])
+                self.index_recall = None if math.isnan(recall) else recall
+                apply_search_params(self.index, self.index_config)
+                self.embeddings = cached['embeddings'] if self._keeps_vectors else None
+                self.doc_ids = cached['doc_ids']
+                self.documents = {
+                    doc['doc_id']: {'text': doc['text'], 'item': MenuItem.from_dict(doc['item'])}
+                    for doc in cached['documents']
+                }
+                self._reset_lookups()
+                self._build_lexical()
+                print(f"Index loaded from snapshot with {len(self.documents)} items")
+                return
+        
         print("Building FAISS index...")
         
         # Create documents for each menu item
-        for item in self.menu_items:
-            doc = f"{item['name']} - {item['category']}: {item['description']}. "
-            doc += f"Giá: {item['price']:,}đ. "
-            doc += f"Thành phần: {', '.join(item['ingredients'])}."
-            self.documents.append({
-                'text': doc,
-                'item': item
-            })
-        
-        # Generate embeddings
-        texts = [doc['text'] for doc in self.documents]
-        embeddings = self.embedding_model.encode(texts, convert_to_numpy=True)
+        self.documents = {
+            doc_id: {'text': self.format_document(item), 'item': item}
+            for doc_id, item in enumerate(self.menu_items)
+        }
+        self.doc_ids = np.arange(len(self.menu_items), dtype='int64')
+        
+        # Generate embeddings; compressed storage is trained once here
+        texts = [doc['text'] for doc in self.documents.values()]
+        embeddings = self._encode(texts)
+        self.codec.train(embeddings)
+        self.embeddings = self.codec.encode(embeddings)
         
         # Create FAISS index
-        dimension = embeddings.shape[1]
-        self.index = faiss.IndexFlatL2(dimension)
-        self.index.add(embeddings.astype('float32'))
+        self._build_vector_index(self.codec.to_index_space(embeddings))
+        self._reset_lookups()
+        self._build_lexical()
+        self.save_snapshot()
         
         print(f"Index built with {len(self.documents)} items")
     
-    def search(self, query: str, top_k: int = 3) -> List[Dict]:
-        """Search for relevant menu items"""
-        query_embedding = self.embedding_model.encode([query], convert_to_numpy=True)
+    def save_snapshot(self):
+        """Persist the current index state under the current menu version"""
+        if self.snapshot is None:
+            return
+        documents = [
+            {'doc_id': doc_id, 'text': doc['text'], 'item': doc['item'].to_dict()}
+            for doc_id, doc in self.documents.items()
+        ]
+        # The index holds every vector; only HNSW needs its own copy to rebuild from
+        vectors = {'embeddings': self.embeddings} if self.embeddings is not None else {}
+        try:
+            self.snapshot.save(self._snapshot_key(), self.index, documents, **vectors,
+                               doc_ids=self.doc_ids, index_type=np.array(self.index_type),
+                               nprobe=np.array(self.index_config.nprobe),
+                               ef_search=np.array(self.index_config.ef_search),
+                               index_recall=np.array(self.index_recall if self.index_recall is not None else math.nan),
+                               **self.codec.state())
+        except OSError as e:
+            print(f"Could not write index snapshot: {e}")
+    
+    def _bump_version(self):
+        """Derive a new menu version after in-memory edits"""
+        items = [doc['item'].to_dict() for doc in self.documents.values()]
+        raw = json.dumps(items, ensure_ascii=False, sort_keys=True).encode('utf-8')
+        self.menu_version = snapshot_key(raw, self.model_name, DOC_TEMPLATE)
+    
+    def _apply_upserts(self, items: Iterable[Dict]) -> int:
+        """Update documents for items, re-embedding only those whose text changed"""
+        # An id listed twice would be added to the index twice; the last version wins
+        items = {item['id']: MenuItem.from_dict(item) for item in items}.values()
+        changed_ids, changed_texts = [], []
+        for item in items:
+            text = self.format_document(item)
+            doc_id = self._doc_of_item.get(item['id'])
+            if doc_id is None:
+                doc_id = self._next_doc_id
+                self._next_doc_id += 1
+                self._doc_of_item[item['id']] = doc_id
+            elif self.documents[doc_id]['text'] == text:
+                # e.g. availability flips: nothing to re-embed
+                self.documents[doc_id] = {'text': text, 'item': item}
+                continue
+            self.documents[doc_id] = {'text': text, 'item': item}
+            self.lexical.add(doc_id, item)
+            changed_ids.append(doc_id)
+            changed_texts.append(text)
+        
+        if not changed_ids:
+            return 0
+        
+        ids = np.array(changed_ids, dtype='int64')
+        embeddings = self._encode(changed_texts)
+        if supports_remove(self.index_type):
+            self.index.remove_ids(ids)
+            self.index.add_with_ids(self.codec.to_index_space(embeddings), ids)
+        
+        new = ~np.isin(ids, self.doc_ids)
+        if self.embeddings is not None:
+            vectors = self.codec.encode(embeddings)
+            for doc_id, vector in zip(changed_ids, vectors):
+                row = self._rows.get(doc_id)
+                if row is not None:
+                    self.embeddings[row] = vector
+            self.embeddings = np.vstack([self.embeddings, vectors[new]])
+        self.doc_ids = np.concatenate([self.doc_ids, ids[new]])
+        
+        if not supports_remove(self.index_type):
+            self._build_vector_index()
+        return len(changed_ids)
+    
+    def _apply_removals(self, item_ids: Iterable[str]) -> int:
+        """Drop items from the index and document store"""
+        doc_ids = [self._doc_of_item[i] for i in item_ids if i in self._doc_of_item]
+        if not doc_ids:
+            return 0
+        
+        ids = np.array(doc_ids, dtype='int64')
+        for doc_id in doc_ids:
+            del self.documents[doc_id]
+            self.lexical.remove(doc_id)
+        
+        keep = ~np.isin(self.doc_ids, ids)
+        if self.embeddings is not None:
+            self.embeddings = self.embeddings[keep]
+        self.doc_ids = self.doc_ids[keep]
+        self._rows = {int(doc_id): row for row, doc_id in enumerate(self.doc_ids)}
+        
+        if supports_remove(self.index_type):
+            self.index.remove_ids(ids)
+        else:
+            self._build_vector_index()
+        return len(doc_ids)
+    
+    def upsert_items(self, items: List[Dict]) -> int:
+        """Add or replace menu items by id; returns the number re-embedded"""
+        self.ensure_ready()
+        with self._state_lock.write():
+            reembedded = self._apply_upserts(items)
+            self._bump_version()
+            self._reset_lookups()
+        return reembedded
+    
+    def upsert_item(self, item: Dict) -> int:
+        """Add or replace a single menu item"""
+        return self.upsert_items([item])
+    
+    def remove_items(self, item_ids: List[str]) -> int:
+        """Remove menu items by id; returns the number removed"""
+        self.ensure_ready()
+        with self._state_lock.write():
+            removed = self._apply_removals(item_ids)
+            self._bump_version()
+            self._reset_lookups()
+        return removed
+    
+    def remove_item(self, item_id: str) -> bool:
+        """Remove a single menu item"""
+        return self.remove_items([item_id]) > 0
+    
+    def reload_menu(self) -> Dict[str, int]:
+        """Diff the menu file against the loaded state and apply only the changes"""
+        self.ensure_ready()
+        items, version = self._read_menu_file()
+        if version == self.menu_version:
+            return {'added': 0, 'updated': 0, 'removed': 0, 'reembedded': 0}
         
-        distances, indices = self.index.search(query_embedding.astype('float32'), top_k)
+        with self._state_lock.write():
+            current = {item['id']: item for item in self.menu_items}
+            incoming = {item['id']: item for item in items}
+            added = [item for item_id, item in incoming.items() if item_id not in current]
+            updated = [item for item_id, item in incoming.items()
+                       if item_id in current and current[item_id] != item]
+            removed = [item_id for item_id in current if item_id not in incoming]
         
+            self._apply_removals(removed)
+            reembedded = self._apply_upserts(updated + added)
+        
+            # Follow the file's ordering for menu_items
+            order = {item['id']: position for position, item in enumerate(items)}
+            self.documents = dict(sorted(self.documents.items(), key=lambda kv: order[kv[1]['item']['id']]))
+            self.menu_version = self.file_version = version
+            self._reset_lookups()
+            self.save_snapshot()
+        
+        print(f"Menu reloaded: {len(added)} added, {len(updated)} updated, {len(removed)} removed")
+        return {'added': len(added), 'updated': len(updated), 'removed': len(removed), 'reembedded': reembedded}
+    
+    def _collect_results(self, distances: np.ndarray, doc_ids: np.ndarray) -> List[Dict]:
+        """Turn one row of FAISS output into ranked {'item', 'distance', 'score'} hits"""
         results = []
-        for idx in indices[0]:
-            if idx < len(self.documents):
-                results.append(self.documents[idx]['item'])
+        for distance, doc_id in zip(distances, doc_ids):
+            doc = self.documents.get(int(doc_id))
+            if doc is not None:
+                results.append({'item': doc['item'], 'distance': float(distance), 'score': -float(distance)})
+        return results
+    
+    def _lexical_results(self, hits: List) -> List[Dict]:
+        """Turn BM25 (doc_id, score) pairs into ranked hits"""
+        return [{'item': self.documents[doc_id]['item'], 'distance': None, 'score': score}
+                for doc_id, score in hits]
+    
+    def _fuse(self, lexical: List[Dict], vector: List[Dict], top_k: int) -> List[Dict]:
+        """Reciprocal rank fusion of lexical and vector hits"""
+        fused = {}
+        for hits in (lexical, vector):
+            for rank, hit in enumerate(hits):
+                entry = fused.setdefault(hit['item']['id'], {'item': hit['item'], 'distance': None, 'score': 0.0})
+                entry['score'] += 1.0 / (self.rrf_k + rank + 1)
+                if hit['distance'] is not None:
+                    entry['distance'] = hit['distance']
+        return sorted(fused.values(), key=lambda hit: hit['score'], reverse=True)[:top_k]
+    
+    def _exact_search(self, query_embeddings: np.ndarray, doc_ids: np.ndarray, top_k: int):
+        """Score a small set of docs directly; cost scales with the set, not the catalog"""
+        vectors = self._stored_vectors(doc_ids)
+        distances = (
+            (query_embeddings ** 2).sum(axis=1, keepdims=True)
+            - 2 * query_embeddings @ vectors.T
+            + (vectors ** 2).sum(axis=1)
+        )
+        k = min(top_k, len(doc_ids))
+        top = np.argpartition(distances, k - 1, axis=1)[:, :k]
+        top_distances = np.take_along_axis(distances, top, axis=1)
+        order = np.argsort(top_distances, axis=1)
+        return np.take_along_axis(top_distances, order, axis=1), doc_ids[np.take_along_axis(top, order, axis=1)]
+    
+    def _vector_search(self, queries: List[str], top_k: int, mask: Optional[np.ndarray] = None) -> List[List[Dict]]:
+        """Dense search with one encode call and one FAISS search
+        
+        Distances are squared L2, or 1 - cosine similarity for the cosine metric.
+        """
+        query_embeddings = self.codec.to_index_space(self._encode_queries(queries))
+        cosine = self.index_config.metric == 'cosine'
+        
+        if mask is None:
+            distances, indices = self.index.search(query_embeddings, top_k)
+            if cosine:
+                distances = 1 - distances
+        else:
+            selected = np.flatnonzero(mask)
+            if len(selected) == 0:
+                return [[] for _ in queries]
+            if len(selected) <= self.brute_force_threshold:
+                distances, indices = self._exact_search(query_embeddings, selected, top_k)
+                if cosine:
+                    # squared L2 between unit vectors is 2 - 2cos
+                    distances = distances / 2
+            else:
+                bitmap = np.packbits(mask, bitorder='little')
+                selector = faiss.IDSelectorBitmap(len(bitmap), faiss.swig_ptr(bitmap))
+                params = search_params(self.index, self.index_config, selector)
+                distances, indices = self.index.search(query_embeddings, top_k, params=params)
+                if cosine:
+                    distances = 1 - distances
+        
+        return [self._collect_results(d, i) for d, i in zip(distances, indices)]
+    
+    def search_many(self, queries: List[str], top_k: int = 3, mode: Optional[str] = None,
+                    category: Union[str, List[str], None] = None, available: Optional[bool] = True,
+                    min_price: Optional[float] = None, max_price: Optional[float] = None) -> List[List[Dict]]:
+        """Search several queries with at most one encode call and one FAISS search
+        
+        mode is 'vector', 'lexical' or 'hybrid' (default: self.search_mode). In hybrid
+        mode, queries that name a dish outright are answered from BM25 alone when
+        lexical_fast_path is on; the rest are fused with FAISS results.
+        category, available and the price bounds filter inside the search, so
+        top_k hits are returned even when the filter is selective.
+        Returns one ranked list of {'item', 'distance', 'score'} per query.
+        """
+        if not queries:
+            return []
+        self.ensure_ready()
+        
+        mode = mode or self.search_mode
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"mode must be one of {SEARCH_MODES}, got {mode!r}")
+        with self._state_lock.read():
+            return self._search_many(queries, top_k, mode, self.attributes.mask(category, available, min_price, max_price))
+    
+    def _search_many(self, queries: List[str], top_k: int, mode: str, mask: Optional[np.ndarray]) -> List[List[Dict]]:
+        """search_many() against a consistent index state (caller holds the read lock)"""
+        if mode == 'vector':
+            return self._vector_search(queries, top_k, mask)
+        
+        depth = max(top_k, self.fusion_depth)
+        lexical_hits = [self.lexical.search(query, depth, allowed=mask) for query in queries]
+        if mode == 'lexical':
+            return [self._lexical_results(hits[:top_k]) for hits in lexical_hits]
+        
+        results = [None] * len(queries)
+        pending = []
+        for i, (query, hits) in enumerate(zip(queries, lexical_hits)):
+            if self.lexical_fast_path and self.lexical.is_confident(query, hits):
+                results[i] = self._lexical_results(hits[:top_k])
+            else:
+                pending.append(i)
+        
+        if pending:
+            vector_hits = self._vector_search([queries[i] for i in pending], depth, mask)
+            for i, hits in zip(pending, vector_hits):
+                results[i] = self._fuse(self._lexical_results(lexical_hits[i]), hits, top_k)
         
         return results
     
+    def search(self, query: str, top_k: int = 3, mode: Optional[str] = None, **filters) -> List[Dict]:
+        """Search for relevant menu items
+        
+        Accepts the same filters as search_many (category, available, min_price, max_price).
+        """
+        return [hit['item'] for hit in self.search_many([query], top_k, mode, **filters)[0]]
+    
+    def memory_bytes(self) -> int:
+        """Rough resident size of this menu's index, vectors and documents"""
+        document_bytes = len(self.menu_items) * 512
+        if not self.is_ready:
+            return document_bytes
+        base = faiss.downcast_index(self.index.index)
+        code_size = getattr(base, 'code_size', base.d * 4)
+        index_bytes = self.index.ntotal * (code_size + 8)  # codes + id map entry
+        vector_bytes = self.embeddings.nbytes if self.embeddings is not None else 0
+        return int(vector_bytes + self.doc_ids.nbytes + index_bytes + document_bytes)
+    
+    def backend_report(self, backend: str = 'int8', k: int = 5, num_threads: Optional[int] = None) -> Dict:
+        """Compare an embedding backend with the fp32 model on this menu's documents"""
+        self.ensure_ready()
+        texts = [doc['text'] for doc in self.documents.values()]
+        report = compare_backends(EMBEDDING_MODEL_NAME, texts, backend, k, num_threads)
+        print(", ".join(f"{key}={value:.3f}" if isinstance(value, float) else f"{key}={value}"
+                        for key, value in report.items()))
+        return report
+    
+    def compression_report(self, modes: Optional[List[str]] = None, queries: Optional[List[str]] = None,
+                           k: int = 10) -> List[Dict]:
+        """Compare storage modes on this menu: memory, latency and recall@k vs float32
+        
+        Re-encodes the documents so the baseline is uncompressed whatever mode is active.
+        Queries default to the document texts themselves.
+        """
+        self.ensure_ready()
+        texts = [doc['text'] for doc in self.documents.values()]
+        embeddings = self._encode(texts)
+        query_embeddings = self._encode(queries) if queries else embeddings
+        report = compression_report(embeddings, query_embeddings, modes, k,
+                                    pca_dim=self.index_config.pca_dim,
+                                    cosine=self.index_config.metric == 'cosine',
+                                    keeps_vectors=self._keeps_vectors)
+        
+        for row in report:
+            recall = row[f'recall@{min(k, len(embeddings))}']
+            print(f"{row['mode']:<6} dim={row['dimension']:<4} vectors={row['vector_bytes'] / 1024:>9.1f}KB "
+                  f"index={row['index_bytes'] / 1024:>9.1f}KB resident={row['resident_bytes'] / 1024:>9.1f}KB "
+                  f"latency={row['latency_ms']:.3f}ms recall={recall:.3f}")
+        return report
+    
     def get_item_by_id(self, item_id: str) -> Dict:
         """Get menu item by ID"""
-        for item in self.menu_items:
-            if item['id'] == item_id:
-                return item
-        return None
+        return self.catalog.get(item_id)
     
     def get_item_by_name(self, name: str) -> Dict:
         """Get menu item by name (fuzzy match)"""
-        name_lower = name.lower()
-        for item in self.menu_items:
-            if name_lower in item['name'].lower():
-                return item
-        return None
+        return self.catalog.find_by_name(name)
     
     def get_all_items(self) -> List[Dict]:
         """Get all available menu items"""
-        return [item for item in self.menu_items if item['available']]
+        return list(self.catalog.available_items)
@@ -0,0 +1,149 @@
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Callable, Dict
+
+
+class _SessionLocks:
+    """One lock per active session, dropped when nobody holds or waits for it"""
+
+    def __init__(self):
+        self._locks = {}    # session_id -> [lock, users]
+        self._lock = threading.Lock()
+
+    def acquire(self, session_id: str):
+        with self._lock:
+            entry = self._locks.setdefault(session_id, [threading.Lock(), 0])
+            entry[1] += 1
+        entry[0].acquire()
+
+    def release(self, session_id: str):
+        with self._lock:
+            entry = self._locks[session_id]
+            entry[0].release()
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._locks[session_id]
+
+
+class _Job:
+    __slots__ = ('session_id', 'fn', 'future', 'enqueued')
+
+    def __init__(self, session_id: str, fn: Callable, future: Future):
+        self.session_id = session_id
+        self.fn = fn
+        self.future = future
+        self.enqueued = time.monotonic()
+
+
+class RequestScheduler:
+    """Two lanes: rule-based requests run at once, LLM requests go through a bounded worker queue
+
+    Fast requests run on the caller's thread, so cart and order operations
+    never wait behind generation. LLM requests are handled by `llm_workers`
+    threads; at most `max_pending` may be queued, beyond that submit_llm()
+    raises queue.Full. Requests of one session never run concurrently, and
+    its LLM requests run in the order they were submitted.
+    """
+
+    def __init__(self, llm_workers: int = 1, max_pending: int = 32, window: int = 1000):
+        self.max_pending = max_pending
+        self._sessions = _SessionLocks()
+        self._ready = queue.Queue()
+        self._waiting = {}      # session_id -> jobs queued behind that session's running LLM job
+        self._pending = 0
+        self._lock = threading.Lock()
+
+        self._waits = deque(maxlen=window)
+        self._fast_latencies = deque(maxlen=window)
+        self.completed = {'fast': 0, 'llm': 0}
+        self.rejected = 0
+
+        self._workers = [
+            threading.Thread(target=self._work, name=f"llm-worker-{i}", daemon=True)
+            for i in range(llm_workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def run_fast(self, session_id: str, fn: Callable):
+        """Run a rule-based request now, on this thread"""
+        start = time.monotonic()
+        self._sessions.acquire(session_id)
+        try:
+            return fn()
+        finally:
+            self._sessions.release(session_id)
+            with self._lock:
+                self.completed['fast'] += 1
+                self._fast_latencies.append(time.monotonic() - start)
+
+    def submit_llm(self, session_id: str, fn: Callable) -> Future:
+        """Queue an LLM-bound request; the Future resolves with fn()'s result"""
+        job = _Job(session_id, fn, Future())
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.rejected += 1
+                raise queue.Full(f"{self._pending} LLM requests already queued")
+            self._pending += 1
+            if session_id in self._waiting:
+                # An earlier request of this session is queued or running
+                self._waiting[session_id].append(job)
+            else:
+                self._waiting[session_id] = deque()
+                self._ready.put(job)
+        return job.future
+
+    def run_llm(self, session_id: str, fn: Callable, timeout: float = None):
+        """submit_llm() and wait for the result"""
+        return self.submit_llm(session_id, fn).result(timeout)
+
+    def _work(self):
+        while True:
+            job = self._ready.get()
+            with self._lock:
+                self._waits.append(time.monotonic() - job.enqueued)
+
+            if job.future.set_running_or_notify_cancel():
+                self._sessions.acquire(job.session_id)
+                try:
+                    job.future.set_result(job.fn())
+                except BaseException as e:
+                    job.future.set_exception(e)
+                finally:
+                    self._sessions.release(job.session_id)
+
+            with self._lock:
+                self._pending -= 1
+                self.completed['llm'] += 1
+                waiting = self._waiting[job.session_id]
+                if waiting:
+                    self._ready.put(waiting.popleft())
+                else:
+                    del self._waiting[job.session_id]
+
+    @staticmethod
+    def _summary(samples) -> Dict:
+        if not samples:
+            return {'avg_ms': 0.0, 'p95_ms': 0.0, 'max_ms': 0.0}
+        ordered = sorted(samples)
+        return {
+            'avg_ms': 1000 * sum(ordered) / len(ordered),
+            'p95_ms': 1000 * ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))],
+            'max_ms': 1000 * ordered[-1]
+        }
+
+    def stats(self) -> Dict:
+        """LLM requests queued or running, queue wait and fast-lane latency over the recent window"""
+        with self._lock:
+            return {
+                'queue_depth': self._pending,
+                'max_pending': self.max_pending,
+                'llm_workers': len(self._workers),
+                'completed': dict(self.completed),
+                'rejected': self.rejected,
+                'llm_wait': self._summary(self._waits),
+                'fast_latency': self._summary(self._fast_latencies)
+            }
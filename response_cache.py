@@ -0,0 +1,111 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+
+class SemanticResponseCache:
+    """LLM answers reused for paraphrased questions about the same dishes
+
+    An entry is found when the menu version, the retrieved item ids and the
+    rest of the prompt (`context`, e.g. the previous chat turn) match exactly
+    and the cosine similarity of the query embeddings reaches `threshold`.
+    retire() drops the entries of a menu's older versions as soon as it
+    changes; `ttl` optionally bounds how long any answer is reused.
+    """
+
+    def __init__(self, max_size: int = 1024, threshold: float = 0.92, ttl: Optional[float] = None):
+        self.max_size = max_size
+        self.threshold = threshold
+        self.ttl = ttl
+        self._entries = OrderedDict()   # entry id -> (bucket, unit vector, response, created)
+        self._buckets = {}              # (menu version, item ids, context hash) -> [entry id, ...]
+        self._versions = {}             # menu source -> current menu version
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _bucket(menu_version: str, item_ids: Iterable[str], context: str) -> Tuple:
+        return menu_version, tuple(item_ids), hashlib.sha1(context.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def _unit(vector: np.ndarray) -> np.ndarray:
+        vector = np.asarray(vector, dtype='float32').ravel()
+        return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+    def get(self, query_vector: np.ndarray, menu_version: str, item_ids: Iterable[str],
+            context: str = '') -> Optional[str]:
+        """Cached response for a similar enough query over the same retrieved items and context, else None"""
+        bucket = self._bucket(menu_version, item_ids, context)
+        query = self._unit(query_vector)
+        now = time.monotonic()
+        with self._lock:
+            best_id, best_score = None, self.threshold
+            for entry_id in list(self._buckets.get(bucket, ())):
+                _, vector, _, created = self._entries[entry_id]
+                if self.ttl is not None and now - created > self.ttl:
+                    self._drop(entry_id)
+                    continue
+                score = float(vector @ query)
+                if score >= best_score:
+                    best_id, best_score = entry_id, score
+            if best_id is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(best_id)
+            self.hits += 1
+            return self._entries[best_id][2]
+
+    def put(self, query_vector: np.ndarray, menu_version: str, item_ids: Iterable[str], response: str,
+            context: str = ''):
+        bucket = self._bucket(menu_version, item_ids, context)
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = (bucket, self._unit(query_vector), response, time.monotonic())
+            self._buckets.setdefault(bucket, []).append(entry_id)
+            while len(self._entries) > self.max_size:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _drop(self, entry_id: int):
+        """Remove one entry and its bucket slot (caller holds the lock)"""
+        bucket = self._entries.pop(entry_id)[0]
+        ids = self._buckets[bucket]
+        ids.remove(entry_id)
+        if not ids:
+            del self._buckets[bucket]
+
+    def retire(self, source: str, menu_version: str):
+        """Record the current version of a menu and drop entries of its previous one"""
+        with self._lock:
+            previous = self._versions.get(source)
+            self._versions[source] = menu_version
+            if previous is None or previous == menu_version:
+                return
+            for bucket in [bucket for bucket in self._buckets if bucket[0] == previous]:
+                for entry_id in list(self._buckets[bucket]):
+                    self._drop(entry_id)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._buckets.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions
+            }
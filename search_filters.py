@@ -0,0 +1,69 @@
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+
+from text_utils import normalize_query
+
+
+class AttributeIndex:
+    """Doc-id bitsets per category and availability, plus a price-sorted id array
+
+    Masks are boolean arrays indexed by doc id, ready to be packed into a FAISS
+    IDSelectorBitmap.
+    """
+
+    def __init__(self, documents: Dict[int, Dict], size: int):
+        self.size = size
+        self.present = np.zeros(size, dtype=bool)
+        self.available = np.zeros(size, dtype=bool)
+        self.categories = {}    # normalized category -> bitset
+
+        doc_ids = np.fromiter(documents.keys(), dtype='int64', count=len(documents))
+        prices = np.fromiter((doc['item']['price'] for doc in documents.values()),
+                             dtype='float64', count=len(documents))
+        self.present[doc_ids] = True
+
+        for doc_id, doc in documents.items():
+            item = doc['item']
+            if item['available']:
+                self.available[doc_id] = True
+            key = normalize_query(item['category'])
+            if key not in self.categories:
+                self.categories[key] = np.zeros(size, dtype=bool)
+            self.categories[key][doc_id] = True
+
+        order = np.argsort(prices, kind='stable')
+        self.price_ids = doc_ids[order]
+        self.sorted_prices = prices[order]
+        self.count = len(doc_ids)
+
+    def mask(self, category: Union[str, List[str], None] = None, available: Optional[bool] = None,
+             min_price: Optional[float] = None, max_price: Optional[float] = None) -> Optional[np.ndarray]:
+        """Combine the requested predicates; None means nothing is filtered out"""
+        if category is None and available is None and min_price is None and max_price is None:
+            return None
+
+        mask = self.present.copy()
+        if available is not None:
+            mask &= self.available if available else ~self.available
+
+        if category is not None:
+            wanted = [category] if isinstance(category, str) else category
+            category_mask = np.zeros(self.size, dtype=bool)
+            for name in wanted:
+                bits = self.categories.get(normalize_query(name))
+                if bits is not None:
+                    category_mask |= bits
+            mask &= category_mask
+
+        if min_price is not None or max_price is not None:
+            lo = np.searchsorted(self.sorted_prices, min_price, 'left') if min_price is not None else 0
+            hi = np.searchsorted(self.sorted_prices, max_price, 'right') if max_price is not None else self.count
+            price_mask = np.zeros(self.size, dtype=bool)
+            price_mask[self.price_ids[lo:hi]] = True
+            mask &= price_mask
+
+        # A filter that keeps everything is the same as no filter
+        if np.count_nonzero(mask) == self.count:
+            return None
+        return mask
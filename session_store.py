@@ -0,0 +1,230 @@
+import json
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, Optional
+
+
+class SessionStore(ABC):
+    """Where chat sessions live between messages
+
+    get() returns the stored session or None; callers mutate the returned dict
+    and hand it back with save() once the message is handled.
+    """
+
+    @abstractmethod
+    def get(self, session_id: str) -> Optional[Dict]:
+        ...
+
+    @abstractmethod
+    def save(self, session_id: str, session: Dict):
+        ...
+
+    @abstractmethod
+    def delete(self, session_id: str):
+        ...
+
+    @abstractmethod
+    def __len__(self) -> int:
+        ...
+
+    @abstractmethod
+    def stats(self) -> Dict:
+        ...
+
+
+class InMemorySessionStore(SessionStore):
+    """Per-process sessions, dropped after `ttl` seconds idle or when over `max_sessions` (LRU)"""
+
+    def __init__(self, max_sessions: int = 10000, ttl: Optional[float] = 3600):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._sessions = OrderedDict()      # session_id -> (last_access, session), LRU order
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, session_id: str) -> Optional[Dict]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is not None and self.ttl is not None and now - entry[0] > self.ttl:
+                del self._sessions[session_id]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._sessions[session_id] = (now, entry[1])
+            self._sessions.move_to_end(session_id)
+            self.hits += 1
+            return entry[1]
+
+    def save(self, session_id: str, session: Dict):
+        now = time.monotonic()
+        with self._lock:
+            self._sessions[session_id] = (now, session)
+            self._sessions.move_to_end(session_id)
+            self._expire(now)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self.evictions += 1
+
+    def _expire(self, now: float):
+        """Drop idle sessions from the LRU end (caller holds the lock)"""
+        if self.ttl is None:
+            return
+        while self._sessions:
+            last_access, _ = next(iter(self._sessions.values()))
+            if now - last_access <= self.ttl:
+                break
+            self._sessions.popitem(last=False)
+            self.expirations += 1
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'backend': 'memory',
+                'size': len(self._sessions),
+                'max_sessions': self.max_sessions,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations
+            }
+
+
+def _to_json(value):
+    """Menu items and carts serialize through their to_dict()"""
+    if hasattr(value, 'to_dict'):
+        return value.to_dict()
+    raise TypeError(f"Cannot store {type(value).__name__} in a session")
+
+
+class SQLiteSessionStore(SessionStore):
+    """Sessions as JSON rows in SQLite, shared by every worker process using the same file
+
+    Rows idle for more than `ttl` seconds are ignored and purged; beyond
+    `max_sessions` the least recently saved rows are deleted.
+    """
+
+    def __init__(self, db_path: str = "sessions.db", ttl: Optional[float] = 24 * 3600,
+                 max_sessions: Optional[int] = 100000, purge_every: int = 100):
+        self.db_path = db_path
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.purge_every = purge_every
+        self._writes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.init_db()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def init_db(self):
+        """Initialize the sessions table"""
+        conn = self._connect()
+        # WAL lets other workers read while one writes
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS sessions (
+                session_id TEXT PRIMARY KEY,
+                data TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_updated ON sessions (updated_at)")
+        conn.commit()
+        conn.close()
+
+    def get(self, session_id: str) -> Optional[Dict]:
+        conn = self._connect()
+        row = conn.execute("SELECT data, updated_at FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        conn.close()
+
+        with self._lock:
+            if row is not None and self.ttl is not None and time.time() - row[1] > self.ttl:
+                self.expirations += 1
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(row[0])
+
+    def save(self, session_id: str, session: Dict):
+        data = json.dumps(session, ensure_ascii=False, separators=(',', ':'), default=_to_json)
+        conn = self._connect()
+        conn.execute("INSERT OR REPLACE INTO sessions (session_id, data, updated_at) VALUES (?, ?, ?)",
+                     (session_id, data, time.time()))
+        conn.commit()
+
+        with self._lock:
+            self._writes += 1
+            purge = self._writes % self.purge_every == 0
+        if purge:
+            self._purge(conn)
+        conn.close()
+
+    def _purge(self, conn: sqlite3.Connection):
+        """Delete expired rows, then the oldest ones beyond max_sessions"""
+        expired = evicted = 0
+        if self.ttl is not None:
+            expired = conn.execute("DELETE FROM sessions WHERE updated_at < ?", (time.time() - self.ttl,)).rowcount
+        if self.max_sessions is not None:
+            evicted = conn.execute("""
+                DELETE FROM sessions WHERE session_id IN (
+                    SELECT session_id FROM sessions ORDER BY updated_at DESC LIMIT -1 OFFSET ?
+                )
+            """, (self.max_sessions,)).rowcount
+        conn.commit()
+        with self._lock:
+            self.expirations += expired
+            self.evictions += evicted
+
+    def delete(self, session_id: str):
+        conn = self._connect()
+        conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+        conn.commit()
+        conn.close()
+
+    def __len__(self) -> int:
+        conn = self._connect()
+        count = conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+        conn.close()
+        return count
+
+    def stats(self) -> Dict:
+        conn = self._connect()
+        size, data_bytes = conn.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(data)), 0) FROM sessions").fetchone()
+        conn.close()
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'backend': 'sqlite',
+                'size': size,
+                'data_bytes': data_bytes,
+                'max_sessions': self.max_sessions,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations
+            }
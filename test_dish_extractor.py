@@ -0,0 +1,65 @@
+import pytest
+
+from dish_extractor import DishExtractor
+
+MENU = [
+    {'id': 'P001', 'name': 'Phở Bò'},
+    {'id': 'P002', 'name': 'Phở Gà'},
+    {'id': 'P003', 'name': 'Bún Bò Huế'},
+    {'id': 'P004', 'name': 'Bún Chả Hà Nội'},
+    {'id': 'D003', 'name': 'Cà Phê Sữa Đá'},
+    {'id': 'D004', 'name': 'Cà Phê Đen'},
+]
+
+
+@pytest.fixture(scope='module')
+def extractor():
+    return DishExtractor(MENU)
+
+
+def lines(extractor, text):
+    return [(m.item['id'], m.quantity, m.unit) for m in extractor.extract(text)]
+
+
+@pytest.mark.parametrize('text, expected', [
+    ("Thêm 2 ly cà phê sữa đá", [('D003', 2, 'ly')]),
+    ("cho tôi phở bò", [('P001', 1, None)]),
+    ("hai phở gà", [('P002', 2, None)]),
+    ("cho mười hai phở bò", [('P001', 12, None)]),
+    ("mười lăm bún chả", [('P004', 15, None)]),
+    ("hai mươi lăm phần bún chả", [('P004', 25, 'phần')]),
+    ("hai mươi mốt phở bò", [('P001', 21, None)]),
+    ("phở bò hai mươi tư tô", [('P001', 24, 'tô')]),
+    ("muoi phan pho bo", [('P001', 10, 'phần')]),
+    ("bún bò huế 2 phần", [('P003', 2, 'phần')]),
+    ("hai phở bò x3", [('P001', 3, None)]),
+])
+def test_quantities(extractor, text, expected):
+    assert lines(extractor, text) == expected
+
+
+@pytest.mark.parametrize('text, expected', [
+    # A trailing quantity belongs to the dish before it only when that dish had none in front
+    ("1 phở bò 2 phần bún chả", [('P001', 1, None), ('P004', 2, 'phần')]),
+    ("phở bò 2 phần bún chả 3 phần", [('P001', 2, 'phần'), ('P004', 3, 'phần')]),
+    ("phở bò, ba phần bún chả", [('P001', 1, None), ('P004', 3, 'phần')]),
+    ("1 cà phê đen và 2 ly cà phê sữa đá", [('D004', 1, None), ('D003', 2, 'ly')]),
+])
+def test_several_dishes(extractor, text, expected):
+    assert lines(extractor, text) == expected
+
+
+def test_unaccented_and_short_names(extractor):
+    assert lines(extractor, "2 ly ca phe sua da") == [('D003', 2, 'ly')]
+    # "bún chả" is an unambiguous prefix of "Bún Chả Hà Nội"; "cà phê" is not
+    assert lines(extractor, "bún chả nhé") == [('P004', 1, None)]
+    assert lines(extractor, "cà phê") == []
+
+
+def test_typed_accents_must_agree(extractor):
+    assert lines(extractor, "phở gà") == [('P002', 1, None)]
+    assert lines(extractor, "phố gà") == []
+
+
+def test_mentions_inside_words_are_ignored(extractor):
+    assert lines(extractor, "phở bòn") == []
@@ -0,0 +1,27 @@
+import re
+import unicodedata
+from typing import List
+
+_WHITESPACE = re.compile(r"\s+")
+_EDGE_PUNCTUATION = re.compile(r"^[\s\.,!?;:…\"'()\-]+|[\s\.,!?;:…\"'()\-]+$")
+
+
+def normalize_query(text: str) -> str:
+    """Canonical form of a user query: NFC, lowercase, trimmed, single-spaced"""
+    text = unicodedata.normalize('NFC', text).lower()
+    text = _EDGE_PUNCTUATION.sub('', text)
+    return _WHITESPACE.sub(' ', text)
+
+_WORD = re.compile(r"\w+")
+
+
+def fold_accents(text: str) -> str:
+    """Strip Vietnamese diacritics, e.g. 'Phở Bò đặc biệt' -> 'Pho Bo dac biet'"""
+    text = unicodedata.normalize('NFD', text)
+    text = ''.join(ch for ch in text if unicodedata.category(ch) != 'Mn')
+    return unicodedata.normalize('NFC', text).replace('đ', 'd').replace('Đ', 'D')
+
+
+def tokenize(text: str) -> List[str]:
+    """Split normalized text into Vietnamese syllables"""
+    return _WORD.findall(normalize_query(text))